@@ -0,0 +1,115 @@
+import os
+import json
+
+from bike_frame import generate_prompt
+from trace_parser import final_labels
+
+DEFAULT_BATCH_DIR = "batch"
+CHAT_COMPLETIONS_URL = "/v1/chat/completions"
+# Per-file limits of the OpenAI Batch API.
+MAX_REQUESTS_PER_FILE = 50_000
+MAX_BYTES_PER_FILE = 200 * 2**20
+CUSTOM_ID_PREFIX = "bikeframe-"
+
+
+def custom_id(original_index):
+    return f"{CUSTOM_ID_PREFIX}{original_index}"
+
+
+def original_index_of(custom_id_value):
+    index = custom_id_value[len(CUSTOM_ID_PREFIX):] if custom_id_value.startswith(CUSTOM_ID_PREFIX) else custom_id_value
+    return int(index) if index.isdigit() else index
+
+
+def export_batch(rows, model, out_dir=DEFAULT_BATCH_DIR, prompt=generate_prompt,
+                 max_requests=MAX_REQUESTS_PER_FILE, max_bytes=MAX_BYTES_PER_FILE, **params):
+    '''
+    Stream rows through `prompt` and write one Batch API request line per headline into
+    `out_dir/requests_000.jsonl`, `requests_001.jsonl`, ... Each file stays under `max_requests`
+    lines and `max_bytes` bytes.
+    Returns:
+        list: paths of the written files.
+    '''
+    os.makedirs(out_dir, exist_ok=True)
+    paths = []
+    f = None
+    n_requests = n_bytes = 0
+    try:
+        for row in rows:
+            request = {
+                "custom_id": custom_id(row.get("original_index")),
+                "method": "POST",
+                "url": CHAT_COMPLETIONS_URL,
+                "body": {"model": model, "messages": prompt(row), **params},
+            }
+            line = (json.dumps(request, ensure_ascii=False) + "\n").encode("utf-8")
+            if len(line) > max_bytes:
+                raise ValueError(f"request for row {row.get('original_index')} is larger than {max_bytes} bytes")
+            if f is None or n_requests >= max_requests or n_bytes + len(line) > max_bytes:
+                if f is not None:
+                    f.close()
+                paths.append(os.path.join(out_dir, f"requests_{len(paths):03d}.jsonl"))
+                f = open(paths[-1], "wb")
+                n_requests = n_bytes = 0
+            f.write(line)
+            n_requests += 1
+            n_bytes += len(line)
+    finally:
+        if f is not None:
+            f.close()
+    return paths
+
+
+def read_jsonl(paths):
+    if isinstance(paths, str):
+        paths = [paths]
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def import_batch_results(result_paths, rows=None, parser=final_labels):
+    '''
+    Read Batch API output files into runner-style results with labels parsed by `parser`. When `rows`
+    are given, results are returned in row order and rows missing from the output are reported as errors.
+    '''
+    results = {}
+    for line in read_jsonl(result_paths):
+        index = original_index_of(line["custom_id"])
+        result = {"original_index": index}
+        response = line.get("response") or {}
+        if line.get("error") or response.get("status_code", 200) != 200:
+            result["error"] = json.dumps(line.get("error") or response.get("body"), ensure_ascii=False)
+        else:
+            text = response["body"]["choices"][0]["message"]["content"]
+            result["response"] = text
+            result["labels"] = parser(text)
+        results[index] = result
+
+    if rows is None:
+        return list(results.values())
+    return [
+        results.get(row.get("original_index"), {"original_index": row.get("original_index"), "error": "missing from batch output"})
+        for row in rows
+    ]
+
+
+def stand_in_results(request_paths, out_path, respond):
+    '''
+    Write a Batch API output file for `request_paths` without the network, answering each request
+    with `respond(messages)`. Lets the export/import flow run offline.
+    '''
+    with open(out_path, "w", encoding="utf-8") as f:
+        for i, request in enumerate(read_jsonl(request_paths)):
+            body = {
+                "object": "chat.completion",
+                "model": request["body"]["model"],
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": respond(request["body"]["messages"])}}],
+            }
+            line = {"id": f"batch_req_{i}", "custom_id": request["custom_id"],
+                    "response": {"status_code": 200, "request_id": f"stand-in-{i}", "body": body}, "error": None}
+            f.write(json.dumps(line, ensure_ascii=False) + "\n")
+    return out_path
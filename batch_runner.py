@@ -0,0 +1,260 @@
+import time
+import asyncio
+import random
+
+from bike_frame import DEFAULT_TEMPLATE, PromptTemplate, generate_prompt
+from dataset import DEFAULT_DATA_PATH, load_dataset  # noqa: F401  re-exported for existing callers
+from response_cache import cache_key
+from trace_parser import TraceParser, final_labels
+
+DEFAULT_MODEL = "gpt-4o-mini"
+
+
+def make_client(base_url=None, api_key=None):
+    '''
+    Build the default AsyncOpenAI client. Pass `base_url` to point it at a local mock endpoint.
+    Any object exposing an async `chat.completions.create(...)` can be used instead.
+    '''
+    import openai
+    from dotenv import load_dotenv, find_dotenv
+
+    load_dotenv(find_dotenv())
+    return openai.AsyncOpenAI(base_url=base_url, api_key=api_key)
+
+
+def response_text(response):
+    '''
+    Extract the assistant text from a chat-completion response (SDK object or plain dict).
+    '''
+    if isinstance(response, dict):
+        return response["choices"][0]["message"]["content"]
+    return response.choices[0].message.content
+
+
+def response_usage(response):
+    '''
+    (prompt_tokens, completion_tokens) reported by the endpoint, or None when it sends no usage.
+    '''
+    usage = response.get("usage") if isinstance(response, dict) else getattr(response, "usage", None)
+    if not usage:
+        return None
+    if isinstance(usage, dict):
+        return usage.get("prompt_tokens", 0), usage.get("completion_tokens", 0)
+    return usage.prompt_tokens, usage.completion_tokens
+
+
+def delta_text(chunk):
+    '''
+    Extract the new text from a streamed chat-completion chunk (SDK object or plain dict).
+    '''
+    if isinstance(chunk, dict):
+        choices = chunk.get("choices") or [{}]
+        return choices[0].get("delta", {}).get("content")
+    if not chunk.choices:
+        return None
+    return chunk.choices[0].delta.content
+
+
+class BatchRunner:
+    '''
+    Runs many chat-completion calls at once, one per dataset row, with at most
+    `concurrency` requests in flight. Results come back in input order.
+    '''
+    def __init__(self, client=None, model=DEFAULT_MODEL, concurrency=16, max_retries=3,
+                 prompt=generate_prompt, max_input_tokens=None, token_counter=None, cache=None, stream=False,
+                 pre_classifier=None, metrics=None, parser=final_labels, **params):
+        self.client = client
+        self.model = model
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.prompt = prompt
+        # Rows whose prompt exceeds `max_input_tokens` are rejected before sending.
+        # The token counter must use the same template as `prompt`; by default it is built from it.
+        self.max_input_tokens = max_input_tokens
+        self.token_counter = token_counter
+        self.cache = cache  # optional ResponseCache; hits skip the network entirely
+        # Stream responses and cancel generation as soon as the final tuple has been parsed.
+        self.stream = stream
+        # Optional callable returning labels for rows it can settle locally (e.g. FastPathClassifier), else None.
+        self.pre_classifier = pre_classifier
+        self.metrics = metrics  # optional instrumentation.Metrics; per-stage latencies and counters
+        # Extracts the label tuple from a response; must match the output format `prompt` asks for.
+        self.parser = parser
+        self.params = params  # sampling parameters forwarded to the API, e.g. temperature, max_tokens
+        self._unmetered = []  # (messages, text) of streamed calls whose usage is still to be counted
+
+    async def complete(self, messages):
+        if self.stream:
+            return await self.complete_streaming(messages)
+        start = time.perf_counter()
+        response = await self.client.chat.completions.create(model=self.model, messages=messages, **self.params)
+        if self.metrics is not None:
+            self.metrics.observe("request", time.perf_counter() - start)
+            self.metrics.record_usage(response_usage(response))
+        return response_text(response)
+
+    async def complete_streaming(self, messages):
+        start = time.perf_counter()
+        first_token = None
+        # Usage arrives in a final chunk, so it is only reported when the stream runs to the end.
+        params = {"stream_options": {"include_usage": True}, **self.params}
+        stream = await self.client.chat.completions.create(model=self.model, messages=messages, stream=True, **params)
+        parser = TraceParser()
+        parts = []
+        usage = None
+        try:
+            async for chunk in stream:
+                usage = response_usage(chunk) or usage
+                text = delta_text(chunk)
+                if text:
+                    if first_token is None:
+                        first_token = time.perf_counter()
+                    parts.append(text)
+                    parser.feed(text)
+                    if parser.done:
+                        break
+        finally:
+            close = getattr(stream, "close", None) or getattr(stream, "aclose", None)
+            if close is not None:
+                await close()
+        if self.metrics is not None:
+            end = time.perf_counter()
+            self.metrics.observe("request", end - start)
+            if first_token is not None:
+                self.metrics.observe("first_token", first_token - start)
+                self.metrics.observe("generation", end - first_token)
+            if usage is not None:
+                self.metrics.record_usage(usage)
+            elif self._unmetered is not None:
+                # Stopped at the parsed answer before the usage chunk: counted by record_estimated_usage,
+                # outside the retried call.
+                self._unmetered.append((messages, "".join(parts)))
+        return "".join(parts)
+
+    def record_estimated_usage(self):
+        '''
+        Count the tokens of streamed calls that ended without usage. Best effort: when the tokenizer
+        is unavailable, estimates are switched off for the rest of the run rather than failing a row.
+        '''
+        while self._unmetered:
+            messages, text = self._unmetered.pop()
+            try:
+                counter = self.ensure_token_counter()
+                self.metrics.record_usage((counter.messages_tokens(messages), counter.count_text(text)))
+            except Exception:
+                self._unmetered = None
+
+    async def with_retries(self, make_call):
+        '''
+        Await `make_call()`, retrying failures with exponential backoff.
+        '''
+        for attempt in range(self.max_retries + 1):
+            try:
+                return await make_call()
+            except Exception:
+                if attempt == self.max_retries:
+                    raise
+                if self.metrics is not None:
+                    self.metrics.increment("retries")
+                # Exponential backoff with jitter so retries from many workers don't line up.
+                await asyncio.sleep(min(2 ** attempt, 30) * (0.5 + random.random()))
+
+    async def complete_with_retries(self, messages):
+        return await self.with_retries(lambda: self.complete(messages))
+
+    async def process_row(self, row):
+        if self.metrics is None:
+            return await self.classify_row(row)
+        self.metrics.row_started()
+        result = await self.classify_row(row)
+        self.metrics.row_finished(result)
+        return result
+
+    async def classify_row(self, row):
+        result = {"original_index": row.get("original_index")}
+        if self.pre_classifier is not None:
+            labels = self.pre_classifier(row)
+            if labels is not None:
+                result["labels"] = labels
+                result["fast_path"] = True
+                return result
+        if self.max_input_tokens is not None:
+            input_tokens = self.ensure_token_counter().row_tokens(row)
+            if input_tokens > self.max_input_tokens:
+                result["error"] = f"prompt has {input_tokens} tokens, over the {self.max_input_tokens} limit"
+                return result
+        if self.metrics is None:
+            messages = self.prompt(row)
+        else:
+            with self.metrics.timer("prompt"):
+                messages = self.prompt(row)
+        await self.call(messages, result)
+        return result
+
+    async def call(self, messages, result):
+        '''
+        Fill `result` with the model's response to `messages` and its parsed labels, or an error.
+        '''
+        key = None
+        if self.cache is not None:
+            key = cache_key(self.model, messages, self.params)
+            cached = self.cache.get(key)
+            if cached is not None:
+                result["response"] = cached
+                result["labels"] = self.parse(cached)
+                result["cached"] = True
+                return
+        try:
+            result["response"] = await self.complete_with_retries(messages)
+            if self._unmetered:
+                self.record_estimated_usage()
+            result["labels"] = self.parse(result["response"])
+            # An unparsable answer is retried on the next run, so it must not be replayed from the cache.
+            if key is not None and result["labels"] is not None:
+                self.cache.put(key, result["response"])
+        except Exception as e:
+            result["error"] = f"{type(e).__name__}: {e}"
+
+    def ensure_token_counter(self):
+        '''
+        The token counter, built on first use for the template behind `prompt` when it is a
+        PromptTemplate's bound `render`, else for the default template.
+        '''
+        if self.token_counter is None:
+            from token_budget import TokenCounter
+
+            template = getattr(self.prompt, "__self__", None)
+            if not isinstance(template, PromptTemplate):
+                template = DEFAULT_TEMPLATE
+            self.token_counter = TokenCounter(self.model, template)
+        return self.token_counter
+
+    def parse(self, text):
+        if self.metrics is None:
+            return self.parser(text)
+        with self.metrics.timer("parse"):
+            return self.parser(text)
+
+    async def run(self, rows, on_result=None):
+        '''
+        Classify every row. `on_result`, if given, is called with each result as soon as it finishes.
+        '''
+        if self.client is None:
+            self.client = make_client()
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def worker(row):
+            async with semaphore:
+                result = await self.process_row(row)
+            if on_result is not None:
+                on_result(result)
+            return result
+
+        return await asyncio.gather(*(worker(row) for row in rows))
+
+
+def run_batch(rows, **kwargs):
+    '''
+    Synchronous entry point: `run_batch(load_dataset(), concurrency=32, temperature=0)`.
+    '''
+    return asyncio.run(BatchRunner(**kwargs).run(rows))
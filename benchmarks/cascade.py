@@ -0,0 +1,68 @@
+'''
+Compare a cheap-to-strong model cascade with running the strongest model on every headline.
+
+    python -m benchmarks.cascade --cache cache/responses.sqlite
+    python -m benchmarks.cascade --run --limit 300 --base-url http://localhost:8000/v1 --cache cache/responses.sqlite
+
+By default the cascade is simulated offline against the response cache filled by earlier runs of each
+model (rows missing from the cache count as errors and escalate). With --run, cache misses are sent to
+the endpoint and stored. The report gives per-tier calls and escalation reasons, macro F1 of the
+cascade and of the last tier alone, and the estimated cost per headline of both.
+'''
+import json
+import asyncio
+import argparse
+from itertools import islice
+
+from batch_runner import BatchRunner, make_client
+from cascade import DEFAULT_TIERS, CascadeRunner, build_tiers
+from dataset import DEFAULT_DATA_PATH, load_dataset
+from evaluation import evaluate
+from response_cache import DEFAULT_CACHE_PATH, ResponseCache
+from token_budget import TokenCounter
+from trace_parser import TASKS
+
+
+def scores(rows, results):
+    report = evaluate(rows, {r["original_index"]: r.get("labels") for r in results}, by_publisher=False)
+    return {"f1": {task: round(report[task]["macro_f1"], 4) for task in TASKS},
+            "f1_average": round(report["average_macro_f1"], 4)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data", default=DEFAULT_DATA_PATH)
+    parser.add_argument("--limit", type=int, default=None)
+    parser.add_argument("--models", nargs="+", default=list(DEFAULT_TIERS), help="tiers, cheapest first")
+    parser.add_argument("--threshold", type=float, default=None, help="escalate below this confidence")
+    parser.add_argument("--cache", default=DEFAULT_CACHE_PATH)
+    parser.add_argument("--run", action="store_true", help="send cache misses to the endpoint")
+    parser.add_argument("--base-url", default=None)
+    parser.add_argument("--concurrency", type=int, default=16)
+    args = parser.parse_args()
+
+    rows = list(islice(load_dataset(args.data), args.limit))
+    client = make_client(base_url=args.base_url) if args.run else None
+    counter = TokenCounter(args.models[0])
+    input_tokens = sum(counter.row_tokens(row) for row in rows) / len(rows)
+    output_tokens = counter.example_output_tokens()
+
+    with ResponseCache(args.cache, read_only=not args.run) as cache:
+        cascade = CascadeRunner(build_tiers(args.models, client, cache, temperature=0), threshold=args.threshold,
+                                offline=not args.run, concurrency=args.concurrency)
+        cascade_results = asyncio.run(cascade.run(rows))
+        baseline = CascadeRunner([BatchRunner(client=client, model=args.models[-1], cache=cache, temperature=0)],
+                                 offline=not args.run, concurrency=args.concurrency)
+        baseline_results = asyncio.run(baseline.run(rows))
+
+    cascade_stats = cascade.stats(input_tokens, output_tokens)
+    report = {
+        "cascade": dict(cascade_stats, **scores(rows, cascade_results)),
+        args.models[-1]: dict(cost_per_headline=cascade_stats.get("last_tier_only_cost_per_headline"),
+                              errors=sum("error" in r for r in baseline_results), **scores(rows, baseline_results)),
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+'''
+Compare the full 18-shot prompt with retrieval-selected k-shot prompts.
+
+    python -m benchmarks.few_shot_retrieval --k 4 6 8
+    python -m benchmarks.few_shot_retrieval --k 6 --run --limit 300 --base-url http://localhost:8000/v1
+
+Without --run only input tokens are compared. With --run every variant is sent through
+BatchRunner and macro F1 against the annotations is reported alongside the wall time.
+'''
+import json
+import time
+import asyncio
+import argparse
+from itertools import islice
+
+from bike_frame import DEFAULT_TEMPLATE
+from batch_runner import BatchRunner, DEFAULT_MODEL, make_client
+from dataset import DEFAULT_DATA_PATH, load_dataset
+from evaluation import evaluate
+from few_shot_retrieval import RetrievalPromptTemplate
+from token_budget import REPLY_PRIMING_TOKENS, TokenCounter
+from trace_parser import TASKS
+
+
+def input_tokens(rows, template, counter):
+    # Example turns are shared dicts, so each one is only tokenized once.
+    seen = {}
+
+    def count(message):
+        if id(message) not in seen:
+            seen[id(message)] = counter.count_message(message)
+        return seen[id(message)]
+
+    return [sum(count(m) for m in template.render(row)) + REPLY_PRIMING_TOKENS for row in rows]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data", default=DEFAULT_DATA_PATH)
+    parser.add_argument("--k", type=int, nargs="+", default=[4, 6, 8])
+    parser.add_argument("--limit", type=int, default=None)
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument("--run", action="store_true", help="call the model and report F1")
+    parser.add_argument("--base-url", default=None)
+    parser.add_argument("--concurrency", type=int, default=16)
+    args = parser.parse_args()
+
+    rows = list(islice(load_dataset(args.data), args.limit))
+    variants = {"full": DEFAULT_TEMPLATE}
+    variants.update({f"k={k}": RetrievalPromptTemplate(k=k) for k in args.k})
+    counter = TokenCounter(args.model)
+    client = make_client(base_url=args.base_url) if args.run else None
+
+    report = {}
+    for name, template in variants.items():
+        counts = input_tokens(rows, template, counter)
+        entry = {"input_tokens_total": sum(counts), "input_tokens_mean": round(sum(counts) / len(counts), 1)}
+        if args.run:
+            runner = BatchRunner(client=client, model=args.model, concurrency=args.concurrency,
+                                 prompt=template.render, temperature=0)
+            start = time.perf_counter()
+            results = asyncio.run(runner.run(rows))
+            entry["seconds"] = round(time.perf_counter() - start, 2)
+            scores = evaluate(rows, {r["original_index"]: r.get("labels") for r in results}, by_publisher=False)
+            entry["f1"] = {task: round(scores[task]["macro_f1"], 4) for task in TASKS}
+            entry["f1"]["average"] = round(scores["average_macro_f1"], 4)
+            entry["f1_ci"] = {task: scores[task]["macro_f1_ci"] for task in TASKS}
+        report[name] = entry
+
+    full = report["full"]
+    for name, entry in report.items():
+        entry["tokens_saved"] = round(1 - entry["input_tokens_total"] / full["input_tokens_total"], 4)
+        if args.run:
+            entry["f1_change"] = round(entry["f1"]["average"] - full["f1"]["average"], 4)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+'''
+Compare the full and lean BikeFrame prompt profiles.
+
+    python -m benchmarks.prompt_profiles
+    python -m benchmarks.prompt_profiles --run --limit 300 --base-url http://localhost:8000/v1
+
+Without --run, input tokens per row and the mean few-shot answer length (as the expected output size)
+are compared offline. With --run every profile is sent through BatchRunner and the report adds measured
+output tokens, per-request latency, rows/sec and macro F1 against the annotations.
+'''
+import json
+import time
+import asyncio
+import argparse
+import statistics
+from itertools import islice
+
+from bike_frame import PROMPT_PROFILES
+from batch_runner import BatchRunner, DEFAULT_MODEL, make_client
+from dataset import DEFAULT_DATA_PATH, load_dataset
+from evaluation import evaluate
+from token_budget import TokenCounter
+from trace_parser import TASKS
+
+
+class TimedRunner(BatchRunner):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.latencies = []
+
+    async def complete(self, messages):
+        start = time.perf_counter()
+        text = await super().complete(messages)
+        self.latencies.append(time.perf_counter() - start)
+        return text
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data", default=DEFAULT_DATA_PATH)
+    parser.add_argument("--profiles", nargs="+", default=list(PROMPT_PROFILES))
+    parser.add_argument("--limit", type=int, default=None)
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument("--run", action="store_true", help="call the model and report latency and F1")
+    parser.add_argument("--base-url", default=None)
+    parser.add_argument("--concurrency", type=int, default=16)
+    args = parser.parse_args()
+
+    rows = list(islice(load_dataset(args.data), args.limit))
+    client = make_client(base_url=args.base_url) if args.run else None
+
+    report = {}
+    for name in args.profiles:
+        template = PROMPT_PROFILES[name]
+        counter = TokenCounter(args.model, template)
+        counts = counter.count_rows(rows)
+        entry = {
+            "prefix_tokens": counter.prefix_tokens,
+            "input_tokens_mean": round(float(counts.mean()), 1),
+            "expected_output_tokens": round(counter.example_output_tokens(), 1),
+        }
+        if args.run:
+            runner = TimedRunner(client=client, model=args.model, concurrency=args.concurrency,
+                                 prompt=template.render, temperature=0)
+            start = time.perf_counter()
+            results = asyncio.run(runner.run(rows))
+            elapsed = time.perf_counter() - start
+            responses = [r["response"] for r in results if r.get("response")]
+            scores = evaluate(rows, {r["original_index"]: r.get("labels") for r in results}, by_publisher=False)
+            entry.update({
+                "output_tokens_mean": round(statistics.fmean(counter.count_text(t) for t in responses), 1) if responses else None,
+                "latency_p50": round(statistics.median(runner.latencies), 3) if runner.latencies else None,
+                "rows_per_second": round(len(rows) / elapsed, 2),
+                "errors": sum("error" in r for r in results),
+                "f1": {task: round(scores[task]["macro_f1"], 4) for task in TASKS},
+                "f1_average": round(scores["average_macro_f1"], 4),
+            })
+        report[name] = entry
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
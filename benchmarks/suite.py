@@ -0,0 +1,141 @@
+'''
+Offline performance suite: prompt building, trace parsing, dataset loading and end-to-end rows/sec
+against the local mock endpoint at several concurrency levels.
+
+    python -m benchmarks.suite --save benchmarks/baseline.json
+    python -m benchmarks.suite --compare benchmarks/baseline.json --tolerance 0.2
+
+With --compare, every throughput that fell by more than --tolerance against the baseline is listed
+and the exit status is 1, so the suite can gate a change on an offline box.
+'''
+import os
+import sys
+import gzip
+import json
+import time
+import asyncio
+import argparse
+import tempfile
+from itertools import islice
+
+from bike_frame import PROMPT_PROFILES, FEW_SHOT_EXAMPLES
+from batch_runner import BatchRunner, make_client
+from dataset import DEFAULT_DATA_PATH, load_dataset
+from headline_store import HeadlineStore
+from mock_server import MockServer
+from trace_parser import TraceParser, final_labels, parse_trace
+
+
+def best_rate(function, units, repeat=5):
+    '''
+    Units processed per second by `function()`, best of `repeat` runs.
+    '''
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return units / best if best else float("inf")
+
+
+def prompt_benchmarks(rows):
+    return {f"prompt_{name}_rows_per_second": best_rate(lambda: [template.render(row) for row in rows], len(rows))
+            for name, template in PROMPT_PROFILES.items()}
+
+
+def parser_benchmarks(repeat_traces=50):
+    traces = [answer for _, _, answer in FEW_SHOT_EXAMPLES] * repeat_traces
+    megabytes = sum(len(trace.encode("utf-8")) for trace in traces) / 2**20
+
+    def stream():
+        for trace in traces:
+            parser = TraceParser()
+            for i in range(0, len(trace), 16):
+                parser.feed(trace[i:i + 16])
+                if parser.done:
+                    break
+
+    return {
+        "final_labels_traces_per_second": best_rate(lambda: [final_labels(t) for t in traces], len(traces)),
+        "parse_trace_mb_per_second": best_rate(lambda: [parse_trace(t) for t in traces], megabytes),
+        "streaming_parser_traces_per_second": best_rate(stream, len(traces)),
+    }
+
+
+def loader_benchmarks(path):
+    n_rows = sum(1 for _ in load_dataset(path))
+    with tempfile.TemporaryDirectory() as tmp:
+        gz_path = os.path.join(tmp, "data.json.gz")
+        with open(path, "rb") as src, gzip.open(gz_path, "wb") as dst:
+            dst.write(src.read())
+        return {
+            "load_dataset_rows_per_second": best_rate(lambda: sum(1 for _ in load_dataset(path)), n_rows),
+            "load_dataset_gzip_rows_per_second": best_rate(lambda: sum(1 for _ in load_dataset(gz_path)), n_rows),
+            "headline_store_rows_per_second": best_rate(lambda: HeadlineStore.load(path), n_rows, repeat=3),
+        }
+
+
+def end_to_end_benchmarks(rows, concurrency_levels, latency, tokens_per_second, stream):
+    report = {}
+    with MockServer(latency=latency, tokens_per_second=tokens_per_second) as server:
+        client = make_client(base_url=server.base_url, api_key="mock")
+        for concurrency in concurrency_levels:
+            runner = BatchRunner(client=client, concurrency=concurrency, stream=stream, temperature=0)
+            start = time.perf_counter()
+            results = asyncio.run(runner.run(rows))
+            elapsed = time.perf_counter() - start
+            if any("error" in result for result in results):
+                raise RuntimeError(f"mock run failed: {next(r['error'] for r in results if 'error' in r)}")
+            report[f"end_to_end_c{concurrency}_rows_per_second"] = len(rows) / elapsed
+    return report
+
+
+def compare(report, baseline, tolerance):
+    '''
+    Metrics whose throughput dropped by more than `tolerance` (a fraction) against `baseline`.
+    '''
+    regressions = {}
+    for name, value in report.items():
+        previous = baseline.get(name)
+        if previous and value < previous * (1 - tolerance):
+            regressions[name] = {"baseline": previous, "current": value, "change": value / previous - 1}
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data", default=DEFAULT_DATA_PATH)
+    parser.add_argument("--rows", type=int, default=200, help="rows for the prompt and end-to-end benchmarks")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--latency", type=float, default=0.05, help="mock time to first byte, seconds")
+    parser.add_argument("--tokens-per-second", type=float, default=None, help="mock generation speed")
+    parser.add_argument("--stream", action="store_true")
+    parser.add_argument("--skip-end-to-end", action="store_true")
+    parser.add_argument("--save", default=None, help="write the report here")
+    parser.add_argument("--compare", default=None, help="baseline report to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+
+    rows = list(islice(load_dataset(args.data), args.rows))
+    report = {}
+    report.update(prompt_benchmarks(rows))
+    report.update(parser_benchmarks())
+    report.update(loader_benchmarks(args.data))
+    if not args.skip_end_to_end:
+        report.update(end_to_end_benchmarks(rows, args.concurrency, args.latency, args.tokens_per_second, args.stream))
+    report = {name: round(value, 2) for name, value in report.items()}
+    print(json.dumps(report, indent=2))
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        if regressions:
+            print(json.dumps({"regressions": regressions}, indent=2), file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,4 @@
-import os
-import openai
-import tiktoken
-from itertools import product
-from dotenv import load_dotenv, find_dotenv
-
-def generate_prompt(json_data):
-    
-    title = json_data.get(f"title", "")
-    publisher_title = json_data.get(f"ptitle", "")
-
-    system_message = """\
+SYSTEM_MESSAGE = """\
 ```python
 Class BikeFrame:
     '''
@@ -175,7 +164,7 @@ Class BikeFrame:
 ```
 """
 
-    user_input = f"""\
+USER_TEMPLATE = """\
 ```python
 input_text =  "{title}"
 publisher_title =  "{publisher_title}"
@@ -196,23 +185,13 @@ You don't have to actually run the code and do not care about 'not implemented e
 # 
 ###########################################################################################
 
-###########################################################################################
-#   No
-###########################################################################################
-    user_message1 = """\
-```python
-input_text =  "Durango man spared jail time over road rage with cyclist - The Journal"
-publisher_title =  "The Journal"
-bike_frame = BikeFrame(input_text, publisher_title)
-final_answer = bike_frame.analyze_headline()
-print("Final answer:"+ final_answer)
-``` 
-
-# Instruction: 
-Generate the expected execution output (output from all print() functions) of the code. 
-You don't have to actually run the code and do not care about 'not implemented error'.
-"""
-    assistant_message1 = """\
+# Each example is (headline, publisher title, expected execution output).
+FEW_SHOT_EXAMPLES = [
+    ###########################################################################################
+    #   No
+    ###########################################################################################
+    # potential accident, not happened
+    ('Durango man spared jail time over road rage with cyclist - The Journal', 'The Journal', """\
 Starting analysis of the headline: Durango man spared jail time over road rage with cyclist - The Journal
 Extracted News Source: The Journal
 Is the headline discussing an accident? No, based on rationale: The headline mentions road rage involving a cyclist, but it does not specify that a crash or injury occurred.
@@ -224,23 +203,9 @@ Tone analysis: cyclist is described as 'victim', suggesting sympathetic implicat
 No accident, hence, fault is labeled as 'Unknown'.
 News Coverage Analysis Result: The Journal typically covers stories related to cyclists with a focus on individual responsibility and safety. The tone is often straightforward and factual, avoiding sensationalism even in the context of incidents like road rage or accidents. There is no clear bias against cyclists; the coverage tends to present the facts of each case without overly sympathetic or critical angles towards any party involved.
 Intermediate Rationale: The headline suggests the Durango man showed negative behavior in a road rage with a cyclist, casting the cyclist as the victim and evoking sympathy for them. Therefore, it implies a positive perception towards cyclist.
-Final answer: ('No', 'Unknown', 'Positive')""" # potential accident, not happened
-
-
-    user_message2 = """\
-```python
-input_text =  "Durham mum narrowly missed cyclist and clocked 70mph in 30 zones during police pursuit - Chronicle Live"
-publisher_title =  "Chronicle Live"
-bike_frame = BikeFrame(input_text, publisher_title)
-final_answer = bike_frame.analyze_headline()
-print("Final answer:"+ final_answer)
-``` 
-
-# Instruction: 
-Generate the expected execution output (output from all print() functions) of the code. 
-You don't have to actually run the code and do not care about 'not implemented error'.
-"""
-    assistant_message2 = """\
+Final answer: ('No', 'Unknown', 'Positive')"""),
+    # potential accident, not happened
+    ('Durham mum narrowly missed cyclist and clocked 70mph in 30 zones during police pursuit - Chronicle Live', 'Chronicle Live', """\
 Starting analysis of the headline: Durham mum narrowly missed cyclist and clocked 70mph in 30 zones during police pursuit - Chronicle Live
 Extracted News Source: Chronicle Live
 Is the headline discussing an accident? No, based on rationale: The headline mentions a near miss with a cyclist and a high-speed pursuit, indicating that no actual collision or crash occurred.
@@ -252,23 +217,9 @@ Tone analysis: cyclist is described as 'endangered', suggesting sympathetic impl
 No accident, hence, fault is labeled as 'Unknown'.
 News Coverage Analysis Result: "Chronicle Live" tends to report on cycling-related stories with a focus on practical impacts and community relevance. For instance, their coverage on the temporary closure of the Tyne Pedestrian and Cyclist Tunnels highlights logistical information like the provision of a replacement bus service, emphasizing the direct effects on commuters and cyclists. 
 Intermediate Rationale: The headline portrays the cyclist as being narrowly missed by a speeding vehicle, highlighting their vulnerability in the situation. This depiction of the cyclist as a victim of a potentially dangerous incident may evoke empathy from readers, leading to a positive perception of the cyclist.
-Final answer: ('No', 'Unknown', 'Positive')""" # potential accident, not happened
-    
-    
-    user_message3 = """\
-```python
-input_text =  "Man accused of assaulting teen cyclist in South Davis - Davis Enterprise"
-publisher_title =  "Davis Enterprise"
-bike_frame = BikeFrame(input_text, publisher_title)
-final_answer = bike_frame.analyze_headline()
-print("Final answer:"+ final_answer)
-``` 
-
-# Instruction: 
-Generate the expected execution output (output from all print() functions) of the code. 
-You don't have to actually run the code and do not care about 'not implemented error'.
-"""
-    assistant_message3 = """\
+Final answer: ('No', 'Unknown', 'Positive')"""),
+    # criminal events
+    ('Man accused of assaulting teen cyclist in South Davis - Davis Enterprise', 'Davis Enterprise', """\
 Starting analysis of the headline: Man accused of assaulting teen cyclist in South Davis - Davis Enterprise
 Extracted News Source: Davis Enterprise
 Is the headline discussing an accident? No, based on rationale: The headline indicates an assault, which is a criminal act, but not an accident, because there's no mention of a collision or injury resulting from a crash.
@@ -280,23 +231,9 @@ Tone analysis: teen cyclist is described as 'victim', suggesting sympathetic imp
 No accident, hence, fault is labeled as 'Unknown'.
 News Coverage Analysis Result: The Davis Enterprise generally covers stories related to cyclists with a focus on community impact and safety issues, often featuring detailed accounts of incidents and developments that affect local cyclists. The reporting tends to adopt a straightforward and informative tone, aiming to keep the community well-informed about cycling infrastructure and events. This approach underlines a commitment to providing practical information without sensationalizing the issues involved.
 Intermediate Rationale: The headline focuses on the accusation of assault against a teen cyclist, framing the cyclist as a victim. This portrayal likely generates sympathy for the cyclist, indicating a positive perception towards the cyclist.
-Final answer: ('No', 'Unknown', 'Positive')""" # criminal events
-
-    
-    user_message4 = """\
-```python
-input_text =  "New driver 'traumatised' after cyclist appears from blind spot and dashes across road - STOMP"
-publisher_title =  "STOMP"
-bike_frame = BikeFrame(input_text, publisher_title)
-final_answer = bike_frame.analyze_headline()
-print("Final answer:"+ final_answer)
-``` 
-
-# Instruction: 
-Generate the expected execution output (output from all print() functions) of the code. 
-You don't have to actually run the code and do not care about 'not implemented error'.
-"""
-    assistant_message4 = """\
+Final answer: ('No', 'Unknown', 'Positive')"""),
+    # sarcasm， not realy happened
+    ("New driver 'traumatised' after cyclist appears from blind spot and dashes across road - STOMP", 'STOMP', """\
 Starting analysis of the headline: New driver 'traumatised' after cyclist appears from blind spot and dashes across road - STOMP
 Extracted News Source: STOMP
 Is the headline discussing an accident? No, based on rationale: The use of 'traumatised' in double quotes indicates sarcasm, suggesting that there is no actual crash occurred.
@@ -308,46 +245,18 @@ Tone analysis: driver is described as 'victim', suggesting the headline evokes s
 No accident, hence, fault is labeled as 'Unknown'.
 News Coverage Analysis Result: STOMP Singapore often covers cyclist-related stories with a sensational and provocative tone, focusing on conflicts, accidents, and unusual incidents involving cyclists. The language tends to emphasize drama and conflict, which can attract a lot of reader attention and engagement. Common themes include road altercations between cyclists and drivers, legal consequences for traffic violations, and the broader implications of these incidents on public safety and urban cycling policies.
 Intermediate Rationale: Based on the headline's focus on the cyclist's sudden appearance and action, it suggests a negative perception towards the cyclist, emphasizing the potential danger they posed to the driver. Therefore, it implies a negative perception towards cyclist.
-Final answer: ('No', 'Unknown', 'Negative')""" # sarcasm， not realy happened 
-    
-    
-    user_message5 = """\
-```python
-input_text =  "Ribble Ultra Road launch: all-new aero bike with unique bars - Cyclist"
-publisher_title =  "Cyclist"
-bike_frame = BikeFrame(input_text, publisher_title)
-final_answer = bike_frame.analyze_headline()
-print("Final answer:"+ final_answer)
-``` 
-
-# Instruction: 
-Generate the expected execution output (output from all print() functions) of the code. 
-You don't have to actually run the code and do not care about 'not implemented error'.
-"""
-    assistant_message5 = """\
+Final answer: ('No', 'Unknown', 'Negative')"""),
+    # off-topic neutral
+    ('Ribble Ultra Road launch: all-new aero bike with unique bars - Cyclist', 'Cyclist', """\
 Starting analysis of the headline: Ribble Ultra Road launch: all-new aero bike with unique bars - Cyclist
 Extracted News Source: Cyclist
 Is the headline discussing an accident? No, based on rationale: The headline does not explicitly mention an accident, collision, injury, or fatality.
 Party behaviors: {}
 News Coverage Analysis Result: The news agency 'Cyclist' typically covers stories related to cyclists in a manner that is informative and enthusiast-focused, often highlighting advancements in cycling technology, achievements within the cycling community, and issues pertinent to cyclists. The tone is generally positive and supportive, aiming to foster a strong sense of community among its readership.
 Intermediate Rationale: The headline does not directly attribute the cause of an accident to the cyclist’s behavior, nor does it portray cyclists in a negative light. Given the context of a product launch, the headline is focused on introducing a new bicycle model, which falls outside the typical criteria for assessing perception towards cyclists based on accident-related content. Therefore, it implies a neutral perception towards cyclist.
-Final answer:('No', 'Unknown', 'Neutral')""" # off-topic neutral
-    
-    
-    user_message6 = """\
-```python
-input_text =  "Cyclist dies after collapsing at Loveland Pass during Triple Bypass event - Summit Daily News"
-publisher_title =  "Summit Daily News"
-bike_frame = BikeFrame(input_text, publisher_title)
-final_answer = bike_frame.analyze_headline()
-print("Final answer:"+ final_answer)
-``` 
-
-# Instruction: 
-Generate the expected execution output (output from all print() functions) of the code. 
-You don't have to actually run the code and do not care about 'not implemented error'.
-"""
-    assistant_message6 = """\
+Final answer:('No', 'Unknown', 'Neutral')"""),
+    # injure not caused by accident  (dies)
+    ('Cyclist dies after collapsing at Loveland Pass during Triple Bypass event - Summit Daily News', 'Summit Daily News', """\
 Starting analysis of the headline: Cyclist dies after collapsing at Loveland Pass during Triple Bypass event - Summit Daily News
 Extracted News Source: Summit Daily News
 Is the headline discussing an accident?  No, based on rationale: The headline mentions a cyclist's death after collapsing, indicating a tragic event during a cycling event. But, this injury 'dies' is not the result of a collision or crash-related accident, and therefore it's not considered an accident.
@@ -357,24 +266,9 @@ Tone analysis: Cyclist is described as 'victim', suggesting sympathetic implicat
 No accident, hence, fault is labeled as 'Unknown'.
 News Coverage Analysis Result: Summit Daily News typically covers stories related to cyclists with a focus on community impact and safety. Their reporting on incidents involving cyclists, such as traffic accidents, is factual and thorough, providing details about the events without sensationalism. The tone is generally informative, aimed at keeping the local community aware of safety concerns and developments that affect cyclists. 
 Intermediate Rationale: The headline emphasizes the word "dies," which portrays the cyclist as a victim of unfortunate circumstances, which likely evoking sympathy for the cyclist and concern for safety during such events, leading to a positive perception of the cyclist.
-Final answer: ('No', 'Unknown', 'Positive')""" # injure not caused by accident  (dies)
-    
-    
-    user_message7 = """\
-```python
-input_text =  "Para-cyclist Ablinger hospitalised following race training accident - Insidethegames.biz"
-publisher_title =  "Insidethegames.biz"
-bike_frame = BikeFrame(input_text, publisher_title)
-final_answer = bike_frame.analyze_headline()
-print("Final answer:"+ final_answer)
-``` 
-
-# Instruction: 
-Generate the expected execution output (output from all print() functions) of the code. 
-You don't have to actually run the code and do not care about 'not implemented error'.
-"""
-    
-    assistant_message7 = """\
+Final answer: ('No', 'Unknown', 'Positive')"""),
+    # injure not caused by accident (hospitalised)
+    ('Para-cyclist Ablinger hospitalised following race training accident - Insidethegames.biz', 'Insidethegames.biz', """\
 Starting analysis of the headline: Para-cyclist Ablinger hospitalised following race training accident - Insidethegames.biz
 Extracted News Source: Insidethegames.biz
 Is the headline discussing an accident? No, based on rationale: The headline mentions a race training accident resulting in a para-cyclist being hospitalized. However, since it's not explicitly stated that the injury was caused by a crash or collision. Therefore, it's not classified as an accident.
@@ -384,23 +278,9 @@ Tone analysis: Para-cyclist Ablinger is described as 'hospitalised', suggesting
 No accident, hence, fault is labeled as 'Unknown'.
 News Coverage Analysis Result: Insidethegames.biz typically reports on sports-related incidents with a focus on athlete well-being and performance, often highlighting the challenges and risks associated with competitive sports like cycling. The tone is generally informative and supportive, emphasizing the dedication and resilience of athletes.
 Intermediate Rationale: The headline focuses on the para-cyclist's hospitalization following a training accident, evoking sympathy and concern for the athlete's well-being. The portrayal of the para-cyclist as a victim of the accident suggests a positive perception towards the cyclist.
-Final answer:('No', 'Unknown', 'Positive')"""# injure not caused by accident (hospitalised)
-    
-    user_message8 = """\
-```python
-input_text =  "Cyclist dies after falling from bridge into Columbia River near Golden - Calgary Herald"
-publisher_title =  "Calgary Herald"
-bike_frame = BikeFrame(input_text, publisher_title)
-final_answer = bike_frame.analyze_headline()
-print("Final answer:"+ final_answer)
-``` 
-
-# Instruction: 
-Generate the expected execution output (output from all print() functions) of the code. 
-You don't have to actually run the code and do not care about 'not implemented error'.
-"""
-    
-    assistant_message8 = """\
+Final answer:('No', 'Unknown', 'Positive')"""),
+    # injure not caused by accident (dies)
+    ('Cyclist dies after falling from bridge into Columbia River near Golden - Calgary Herald', 'Calgary Herald', """\
 Starting analysis of the headline: Cyclist dies after falling from bridge into Columbia River near Golden - Calgary Herald
 Extracted News Source: Calgary Herald
 Is the headline discussing an accident? No, based on rationale: The headline suggests that a cyclist fell from a bridge into the Columbia River near Golden and died. Since the injury wasn't caused by a crash or collision, it's not classified as an accident.
@@ -410,25 +290,13 @@ Tone analysis: Cyclist is described as 'dies' and 'victim', suggesting a tragic
 No accident, hence, fault is labeled as 'Unknown'.
 News Coverage Analysis Result: The Calgary Herald typically covers cycling incidents with a focus on factual reporting and community impact, often highlighting safety concerns and the consequences of accidents without strong bias.
 Intermediate Rationale: The headline reports on a tragic incident where a cyclist died after falling from a bridge, emphasizing the unfortunate outcome. The portrayal of the Cyclist as a victim of the accident suggests a positive perception towards the cyclist.
-Final answer:('No', 'Unknown', 'Positive')""" # injure not caused by accident (dies)
-    
-###########################################################################################
-#   Yes
-###########################################################################################
-    user_message9 = """\
-```python
-input_text =  "Greyhound Retail Park: Police hunt cyclist after crash | Echo - Echo"
-publisher_title =  "Echo"
-bike_frame = BikeFrame(input_text, publisher_title)
-final_answer = bike_frame.analyze_headline()
-print("Final answer:"+ final_answer)
-``` 
+Final answer:('No', 'Unknown', 'Positive')"""),
 
-# Instruction: 
-Generate the expected execution output (output from all print() functions) of the code. 
-You don't have to actually run the code and do not care about 'not implemented error'.
-"""
-    assistant_message9 = """\
+    ###########################################################################################
+    #   Yes
+    ###########################################################################################
+    # guilty or criminal
+    ('Greyhound Retail Park: Police hunt cyclist after crash | Echo - Echo', 'Echo', """\
 Starting analysis of the headline: Greyhound Retail Park: Police hunt cyclist after crash | Echo - Echo
 Extracted News Source: Echo
 Is the headline discussing an accident? Yes, based on rationale: The headline explicitly mentions a 'crash', indicating an accident.
@@ -441,23 +309,9 @@ Most likely accident-related fault party: cyclist
 Therefore, the fault is attributed to Cyclist.
 News Coverage Analysis Result: The Echo tends to report on cycling incidents with a focus on law enforcement and cyclist responsibilities, often highlighting accidents and conflicts without a strong advocacy stance for cycling safety.
 Intermediate Rationale: The headline implies a negative perception towards the cyclist by focusing on the police hunt after a crash, suggesting culpability or wrongdoing. Therefore, it's possibly negative perception towards the cyclist.
-Final answer:('Yes', 'Cyclist', 'Negative')""" # guilty or criminal
-    
-    
-    user_message10 = """\
-```python
-input_text =  "Driver pleads guilty to critically injuring cyclist in Avon Lake - Cleveland 19 News"
-publisher_title =  "Cleveland 19 News"
-bike_frame = BikeFrame(input_text, publisher_title)
-final_answer = bike_frame.analyze_headline()
-print("Final answer:"+ final_answer)
-``` 
-
-# Instruction: 
-Generate the expected execution output (output from all print() functions) of the code. 
-You don't have to actually run the code and do not care about 'not implemented error'.
-"""
-    assistant_message10 = """\
+Final answer:('Yes', 'Cyclist', 'Negative')"""),
+    # guilty for injuring
+    ('Driver pleads guilty to critically injuring cyclist in Avon Lake - Cleveland 19 News', 'Cleveland 19 News', """\
 Starting analysis of the headline: Driver pleads guilty to critically injuring cyclist in Avon Lake - Cleveland 19 News
 Extracted News Source: Cleveland 19 News
 Is the headline discussing an accident? Yes, based on rationale: The headline explicitly mentions a driver pleading guilty to critically injuring a cyclist, indicating an accident, collision, injury occurred.
@@ -470,23 +324,9 @@ Most likely accident-related fault party: Driver
 Therefore, the fault is attributed to Other.
 News Coverage Analysis Result: Cleveland 19 News typically covers stories related to cyclists with a focus on road safety and the consequences of traffic violations, often portraying cyclists in a sympathetic light.
 Intermediate Rationale: The headline directly attributes the cause of the accident to the driver's behavior, suggesting that the driver is responsible for the incident. The portrayal of the Cyclist as a victim of the accident suggests a positive perception towards the cyclist.
-Final answer:(Yes, Other, Positive)""" # guilty for injuring
-    
-    
-    user_message11 = """\
-```python
-input_text =  "Norfolk lorry driver set for trial Bungay cyclist death - Eastern Daily Press"
-publisher_title =  "Eastern Daily Press"
-bike_frame = BikeFrame(input_text, publisher_title)
-final_answer = bike_frame.analyze_headline()
-print("Final answer:"+ final_answer)
-``` 
-
-# Instruction: 
-Generate the expected execution output (output from all print() functions) of the code. 
-You don't have to actually run the code and do not care about 'not implemented error'.
-"""
-    assistant_message11 = """\
+Final answer:(Yes, Other, Positive)"""),
+    # guilty for injuring
+    ('Norfolk lorry driver set for trial Bungay cyclist death - Eastern Daily Press', 'Eastern Daily Press', """\
 Starting analysis of the headline: Norfolk lorry driver set for trial Bungay cyclist death - Eastern Daily Press
 Extracted News Source: Eastern Daily Press
 Is the headline discussing an accident? Yes, based on rationale: The headline explicitly mentions a cyclist's death, and the involvement of a lorry driver who is set for trial.
@@ -499,23 +339,9 @@ Most likely accident-related fault party: Norfolk lorry driver
 Therefore, the fault is attributed to Other.
 News Coverage Analysis Result: The Eastern Daily Press has a history of reporting on cyclist incidents with a focus on road safety and often highlights the challenges faced by cyclists, suggesting a generally neutral to slightly positive tone towards cyclists.
 Intermediate Rationale: The headline suggests that the Norfolk lorry driver is facing legal consequences, implying potential fault in the incident. Additionally, the mention of the Bungay cyclist's death evokes sympathy, portraying them as victim. Therefore, it suggests positive perception towards the cyclist.
-Final answer:('Yes', 'Other', 'Positive')""" # guilty for injuring
-    
-    
-    user_message12 = """\
-```python
-input_text =  "Spectator seriously hurt as pro cyclist crashes into crowd - Times of India"
-publisher_title =  "Times of India"
-bike_frame = BikeFrame(input_text, publisher_title)
-final_answer = bike_frame.analyze_headline()
-print("Final answer:"+ final_answer)
-``` 
-
-# Instruction: 
-Generate the expected execution output (output from all print() functions) of the code. 
-You don't have to actually run the code and do not care about 'not implemented error'.
-"""
-    assistant_message12 = """\
+Final answer:('Yes', 'Other', 'Positive')"""),
+    # negative behavior
+    ('Spectator seriously hurt as pro cyclist crashes into crowd - Times of India', 'Times of India', """\
 Starting analysis of the headline: Spectator seriously hurt as pro cyclist crashes into crowd - Times of India
 Extracted News Source: Times of India
 Is the headline discussing an accident? Yes, based on rationale: The headline explicitly mentions a pro cyclist crashing into a crowd, resulting in a spectator being seriously hurt, indicating an accident.
@@ -528,23 +354,9 @@ Most likely accident-related fault party: Pro cyclist
 Therefore, the fault is attributed to Cyclist.
 News Coverage Analysis Result: Times of India typically covers cycling incidents with a focus on safety and legal implications, often highlighting the consequences of accidents involving cyclists and the impact on spectators and the community.
 Intermediate Rationale: The headline highlights the negative outcome of a pro cyclist crashing into a crowd, resulting in a spectator being seriously hurt. The portrayal of the pro cyclist's actions as causing harm to others suggests a negative perception towards the cyclist.
-Final answer:('Yes', 'Cyclist', 'Negative')""" # negative behavior
-
-    
-    user_message13 = """\
-```python
-input_text =  "Cyclist, 14, killed in East Gwillimbury collision, police say - CityNews Toronto"
-publisher_title =  "CityNews Toronto"
-bike_frame = BikeFrame(input_text, publisher_title)
-final_answer = bike_frame.analyze_headline()
-print("Final answer:"+ final_answer)
-``` 
-
-# Instruction: 
-Generate the expected execution output (output from all print() functions) of the code. 
-You don't have to actually run the code and do not care about 'not implemented error'.
-"""
-    assistant_message13 = """\
+Final answer:('Yes', 'Cyclist', 'Negative')"""),
+    # injury in collision or crash
+    ('Cyclist, 14, killed in East Gwillimbury collision, police say - CityNews Toronto', 'CityNews Toronto', """\
 Starting analysis of the headline: Cyclist, 14, killed in East Gwillimbury collision, police say - CityNews Toronto
 Extracted News Source: CityNews Toronto
 Is the headline discussing an accident? Yes, based on rationale: The headline explicitly mentions a collision resulting in the death of a cyclist, indicating a serious accident.
@@ -557,23 +369,9 @@ Most likely accident-related fault party: Unknown
 Therefore, the fault is attributed to Unknown.
 News Coverage Analysis Result: CityNews Toronto generally approaches its coverage on cyclists with a focus on specific incidents and safety concerns, often highlighting tensions between cyclists and law enforcement or city policies. The tone is investigative and sometimes critical, particularly when addressing issues like police interactions with cyclists and the impact of city infrastructure decisions on cyclist safety. 
 Intermediate Rationale: The headline reports on a tragic event involving a young cyclist who was killed in a collision. The focus on the outcome for the cyclist and the use of the term "killed" may evoke a sympathetic response towards the cyclist. Therefore, it implies a positive perception towards cyclist.
-Final answer: ('Yes', 'Unknown', 'Positive')""" # injury in collision or crash
-    
-    
-    user_message14 = """\
-```python
-input_text =  "Cyclist in critical condition after early morning car crash - MyStateline.com"
-publisher_title =  "MyStateline.com"
-bike_frame = BikeFrame(input_text, publisher_title)
-final_answer = bike_frame.analyze_headline()
-print("Final answer:"+ final_answer)
-``` 
-
-# Instruction: 
-Generate the expected execution output (output from all print() functions) of the code. 
-You don't have to actually run the code and do not care about 'not implemented error'.
-"""
-    assistant_message14 = """\
+Final answer: ('Yes', 'Unknown', 'Positive')"""),
+    # injury in collision or crash
+    ('Cyclist in critical condition after early morning car crash - MyStateline.com', 'MyStateline.com', """\
 Starting analysis of the headline: Cyclist in critical condition after early morning car crash - MyStateline.com
 Extracted News Source: MyStateline.com
 Is the headline discussing an accident? Yes, based on rationale: The headline explicitly mentions a 'car crash' involving a cyclist, indicating an accident.
@@ -586,26 +384,13 @@ Most likely accident-related fault party: Unknown
 Therefore, the fault is attributed to Unknown.
 News Coverage Analysis Result: MyStateline.com typically covers cycling incidents with a focus on factual reporting and community impact, often highlighting safety concerns and the consequences of accidents without strong bias.
 Intermediate Rationale: The headline emphasizes the critical condition of the cyclist after a car crash, portraying the cyclist as a victim in need of sympathy and support, leading to a positive perception towards the cyclist.
-Final answer:('Yes', 'Unknown', 'Positive')""" # injury in collision or crash
+Final answer:('Yes', 'Unknown', 'Positive')"""),
 
-###########################################################################################
-# special cases: injuries caused by a crash or collision suggest fault is unknown, while being struck or hit implies fault from another party.
-###########################################################################################
-    
-    user_message15 = """\
-```python
-input_text =  "Bronx cyclist critically injured when struck by car that drove off: NYPD - WPIX 11 New York"
-publisher_title =  "WPIX 11 New York"
-bike_frame = BikeFrame(input_text, publisher_title)
-final_answer = bike_frame.analyze_headline()
-print("Final answer:"+ final_answer)
-``` 
-
-# Instruction: 
-Generate the expected execution output (output from all print() functions) of the code. 
-You don't have to actually run the code and do not care about 'not implemented error'.
-"""
-    assistant_message15 = """\
+    ###########################################################################################
+    #   special cases: injuries caused by a crash or collision suggest fault is unknown, while being struck or hit implies fault from another party.
+    ###########################################################################################
+    # injury by struck
+    ('Bronx cyclist critically injured when struck by car that drove off: NYPD - WPIX 11 New York', 'WPIX 11 New York', """\
 Starting analysis of the headline: Bronx cyclist critically injured when struck by car that drove off: NYPD - WPIX 11 New York
 Extracted News Source: WPIX 11 New York
 Is the headline discussing an accident? Yes, based on rationale: The headline explicitly mentions a cyclist being struck by a car and critically injured, which clearly indicates an accident.
@@ -618,23 +403,9 @@ Most likely accident-related fault party: car
 Therefore, the fault is attributed to Other.
 News Coverage Analysis Result: WPIX 11 New York tends to cover stories about cyclists with a focus on local community impact, safety, and incidents involving cyclists. The coverage is typically straightforward and aims to inform the community about developments that affect public safety and urban mobility. The tone is generally neutral, emphasizing the facts of each incident or policy affecting cyclists, without apparent bias or sensationalism.
 Intermediate Rationale: The headline's passive language, like "struck" and "drove off," paints the cyclist as a victim and suggests fault lies with the driver who fled. The headline focuses on the injury of the cyclist caused by a hit-and-run incident, emphasizing the seriousness of the cyclist's condition and the illegal action of the car driver. This could lead to a perception that sympathizes with the cyclist, implying a positive peception towards the cyclist.
-Final answer: ('Yes', 'Other', 'Positive')""" # injury by struck
-    
-    
-    user_message16 = """\
-```python
-input_text =  "Cyclist struck at Kitchener intersection | TheRecord.com - TheRecord.com"
-publisher_title =  "TheRecord.com"
-bike_frame = BikeFrame(input_text, publisher_title)
-final_answer = bike_frame.analyze_headline()
-print("Final answer:"+ final_answer)
-``` 
-
-# Instruction: 
-Generate the expected execution output (output from all print() functions) of the code. 
-You don't have to actually run the code and do not care about 'not implemented error'.
-"""
-    assistant_message16 = """\
+Final answer: ('Yes', 'Other', 'Positive')"""),
+    # injury by struck
+    ('Cyclist struck at Kitchener intersection | TheRecord.com - TheRecord.com', 'TheRecord.com', """\
 Starting analysis of the headline: Cyclist struck at Kitchener intersection | TheRecord.com - TheRecord.com
 Extracted News Source: TheRecord.com
 Is the headline discussing an accident? Yes, based on rationale: The headline explicitly mentions a cyclist being struck, which indicates a collision.
@@ -647,23 +418,9 @@ Most likely accident-related fault party: Vehicle
 Therefore, the fault is attributed to Other.
 News Coverage Analysis Result: TheRecord.com typically covers cyclist incidents with a focus on factual reporting and safety awareness, often highlighting accidents and their impact on cyclists and road safety.
 Intermediate Rationale: The headline portrays the cyclist as a victim of an incident. The news source's history of advocating for cyclist safety further supports a positive or at least neutral portrayal. Overall, it suggesting a sympathetic portrayal that implies a positive perception towards the cyclist.
-Final answer:('Yes', 'Other', 'Positive')""" # injury by struck
-
-    
-    user_message17 = """\
-```python
-input_text =  "After being hit by a truck, cyclist giving back to hospital that helped her - FortSaskOnline.com"
-publisher_title =  "FortSaskOnline.com"
-bike_frame = BikeFrame(input_text, publisher_title)
-final_answer = bike_frame.analyze_headline()
-print("Final answer:"+ final_answer)
-``` 
-
-# Instruction: 
-Generate the expected execution output (output from all print() functions) of the code. 
-You don't have to actually run the code and do not care about 'not implemented error'.
-"""
-    assistant_message17 = """\
+Final answer:('Yes', 'Other', 'Positive')"""),
+    # injure hit by a truck
+    ('After being hit by a truck, cyclist giving back to hospital that helped her - FortSaskOnline.com', 'FortSaskOnline.com', """\
 Starting analysis of the headline: After being hit by a truck, cyclist giving back to hospital that helped her - FortSaskOnline.com
 Extracted News Source: FortSaskOnline.com
 Is the headline discussing an accident? Yes, based on rationale: The headline explicitly mentions a cyclist being hit by a truck, which indicates an accident.
@@ -676,23 +433,9 @@ Most likely accident-related fault party: Truck
 Therefore, the fault is attributed to Other.
 News Coverage Analysis Result: FortSaskOnline.com typically covers stories related to cyclists with a focus on community impact and positive outcomes, often highlighting resilience and support within the cycling community.
 Intermediate Rationale: The headline portrays the cyclist as a victim of a truck collision, emphasizing the hospital's assistance and the cyclist's subsequent act of gratitude. This narrative evokes sympathy for the cyclist and portrays the cyclist positively, suggesting a positive perception towards cyclist.
-Final answer:('Yes', 'Other', 'Positive')""" # injure hit by a truck
-    
-    
-    user_message18 = """\
-```python
-input_text =  "Cyclist injured in Metheringham hit and run - The Lincolnite"
-publisher_title =  "The Lincolnite"
-bike_frame = BikeFrame(input_text, publisher_title)
-final_answer = bike_frame.analyze_headline()
-print("Final answer:"+ final_answer)
-``` 
-
-# Instruction: 
-Generate the expected execution output (output from all print() functions) of the code. 
-You don't have to actually run the code and do not care about 'not implemented error'.
-"""
-    assistant_message18 = """\
+Final answer:('Yes', 'Other', 'Positive')"""),
+    # injury hit and run
+    ('Cyclist injured in Metheringham hit and run - The Lincolnite', 'The Lincolnite', """\
 Starting analysis of the headline: Cyclist injured in Metheringham hit and run - The Lincolnite
 Extracted News Source: The Lincolnite
 Is the headline discussing an accident? Yes, based on rationale: The headline explicitly mentions a cyclist being injured in a hit and run, which directly indicates an accident involving a collision.
@@ -705,49 +448,188 @@ Most likely accident-related fault party: Unknown Driver
 Therefore, the fault is attributed to Other.
 News Coverage Analysis Result: The Lincolnite typically covers cyclist incidents with a focus on safety and community impact, often highlighting accidents and legal actions related to cycling incidents.
 Intermediate Rationale: The headline directly attributes the cause of the accident to the 'hit and run' by an unknown driver, which evokes sympathy and portrays the cyclist as a victim. This suggests a positive perception towards cyclist.
-Final answer:('Yes', 'Other', 'Positive')""" # injury hit and run
-    
+Final answer:('Yes', 'Other', 'Positive')"""),
+]
 
-    # Few-shot prompting    
-    messages = [
-        {"role": "system", 'content': system_message},
-        {"role": "user", "content": user_message1},
-        {"role": "assistant", "content": assistant_message1},
-        {"role": "user", "content": user_message2},
-        {"role": "assistant", "content": assistant_message2},
-        {"role": "user", "content": user_message3},
-        {"role": "assistant", "content": assistant_message3},
-        {"role": "user", "content": user_message4},
-        {"role": "assistant", "content": assistant_message4},
-        {"role": "user", "content": user_message5},
-        {"role": "assistant", "content": assistant_message5},
-        {"role": "user", "content": user_message6},
-        {"role": "assistant", "content": assistant_message6},
-        {"role": "user", "content": user_message7},
-        {"role": "assistant", "content": assistant_message7},
-        {"role": "user", "content": user_message8},
-        {"role": "assistant", "content": assistant_message8},
-        {"role": "user", "content": user_message9},
-        {"role": "assistant", "content": assistant_message9},
-        {"role": "user", "content": user_message10},
-        {"role": "assistant", "content": assistant_message10},
-        {"role": "user", "content": user_message11},
-        {"role": "assistant", "content": assistant_message11},
-        {"role": "user", "content": user_message12},
-        {"role": "assistant", "content": assistant_message12},
-        {"role": "user", "content": user_message13},
-        {"role": "assistant", "content": assistant_message13},
-        {"role": "user", "content": user_message14},
-        {"role": "assistant", "content": assistant_message14},
-        {"role": "user", "content": user_message15},
-        {"role": "assistant", "content": assistant_message15},
-        {"role": "user", "content": user_message16},
-        {"role": "assistant", "content": assistant_message16},
-        {"role": "user", "content": user_message17},
-        {"role": "assistant", "content": assistant_message17},
-        {"role": "user", "content": user_message18},
-        {"role": "assistant", "content": assistant_message18},
-        {"role": "user", "content": user_input},
-    ]
-    
-    return messages
\ No newline at end of file
+
+def headline_fields(json_data):
+    '''
+    Return the (headline, publisher title) pair used to fill the user turn. Accepts both the
+    dataset's `Title`/`Publisher Title` keys and the short `title`/`ptitle` keys.
+    '''
+    title = json_data.get("Title") or json_data.get("title") or ""
+    publisher_title = json_data.get("Publisher Title") or json_data.get("ptitle") or ""
+    return title, publisher_title
+
+
+def strip_publisher_suffix(title, publisher_title):
+    '''
+    Drop the " - Publisher" suffix that news aggregators append to headlines.
+    '''
+    if publisher_title:
+        for separator in (" - ", " | ", " – "):
+            suffix = separator + publisher_title
+            if title.endswith(suffix):
+                return title[:-len(suffix)]
+    return title
+
+
+class PromptTemplate:
+    '''
+    The few-shot chat prompt with the system message and example turns built once.
+    Every rendered message list shares these prefix entries, so a row only costs its final
+    user turn. The shared message dicts must not be mutated by callers.
+    '''
+    def __init__(self, system_message=SYSTEM_MESSAGE, examples=FEW_SHOT_EXAMPLES, user_template=USER_TEMPLATE):
+        self.system_message = system_message
+        self.examples = tuple(examples)
+        self.user_template = user_template
+        prefix = [{"role": "system", "content": system_message}]
+        for example in self.examples:
+            prefix.extend(self.example_messages(example))
+        self.prefix = tuple(prefix)
+
+    def format_user(self, title, publisher_title):
+        return self.user_template.format(title=title, publisher_title=publisher_title)
+
+    def example_messages(self, example):
+        title, publisher_title, answer = example
+        return (
+            {"role": "user", "content": self.format_user(title, publisher_title)},
+            {"role": "assistant", "content": answer},
+        )
+
+    def user_message(self, json_data):
+        title, publisher_title = headline_fields(json_data)
+        return {"role": "user", "content": self.format_user(title, publisher_title)}
+
+    def render(self, json_data):
+        messages = list(self.prefix)
+        messages.append(self.user_message(json_data))
+        return messages
+
+    def iter_messages(self, rows):
+        '''
+        Lazily yield one message list per row, e.g. `for messages in template.iter_messages(load_dataset()): ...`
+        '''
+        for row in rows:
+            yield self.render(row)
+
+
+###########################################################################################
+#
+#                                    Lean profile
+#
+###########################################################################################
+
+# Minified BikeFrame pseudocode: same steps and print() lines as SYSTEM_MESSAGE, without the long docstrings.
+LEAN_SYSTEM_MESSAGE = """\
+```python
+class BikeFrame:
+    # Classifies a cyclist news headline: accident?, party at fault, perception of the cyclist.
+    def __init__(self, headline, source):
+        self.headline, self.source = headline, source
+
+    def detect_accident_in_headline(self):
+        # (bool, reason): True only if the headline explicitly reports a collision, or an injury/death caused by a crash.
+
+    def conduct_behavior_analysis(self):
+        # {party: behavior} for every party in the headline, passive constructions converted to active.
+
+    def is_cyclist(self, party):
+        # True for cyclist/biker/bicycle/bike/cycling/BMX/velo; False for motorcycle/motorbike/superbike/Harley.
+
+    def analyze_fault_in_accident(self):
+        accident, reason = self.detect_accident_in_headline()
+        accident_label = 'Yes' if accident else 'No'
+        print(f"Is the headline discussing an accident? {accident_label}, based on rationale: {reason}")
+        behaviors = self.conduct_behavior_analysis()
+        print(f"Party behaviors: {behaviors}")
+        laws, tones = {}, {}
+        for party, behavior in behaviors.items():
+            laws[party] = violated, why = self.assess_traffic_law_violations_for_party(party, behavior)
+            print(f"Law analysis: {party} {'violated the law' if violated else 'did not violate the law'}. Rationale: {why}")
+        for party in behaviors:
+            tones[party] = tone, why = self.analyze_tone_for_party(party)
+            print(f"Tone analysis: {party} is described as '{tone}', suggesting {why}.")
+        if accident:
+            party = self.determine_most_likely_fault(behaviors, laws, tones)
+            print(f"Most likely accident-related fault party: {party}")
+            fault_label = 'Unknown' if party == 'Unknown' else ('Cyclist' if self.is_cyclist(party) else 'Other')
+            print(f"Therefore, the fault is attributed to {fault_label}.")
+        else:
+            print("No accident, hence, fault is labeled as 'Unknown'.")
+            fault_label = 'Unknown'
+        return accident_label, fault_label, behaviors, tones
+
+    def assess_cyclist_perception(self):
+        print("Extracted News Source:", self.source)
+        accident_label, fault_label, behaviors, tones = self.analyze_fault_in_accident()
+        coverage = self.analyze_news_coverage(self.source)  # how this agency usually covers cyclists: tone, themes, bias
+        print("News Coverage Analysis Result:", coverage)
+        criteria = {
+            "negative": "blames the accident or injury on the cyclist's behavior",
+            "positive": "portrays cyclists favorably or as sympathetic victims",
+            "neutral": "impartial, objective information without judgment or emotional appeal",
+        }
+        rationale = self.generate_cyclist_perception_rationale(self.headline, criteria)
+        print(f"Intermediate Rationale: {rationale}")
+        perception_label = self.predict_final_perception(rationale, behaviors, tones, coverage, criteria)
+        return accident_label, fault_label, perception_label
+
+    def analyze_headline(self):
+        print(f"Starting analysis of the headline: {self.headline}")
+        return self.assess_cyclist_perception()  # ('Yes'|'No', 'Cyclist'|'Other'|'Unknown', 'Negative'|'Positive'|'Neutral')
+```
+"""
+
+LEAN_USER_TEMPLATE = """\
+```python
+print("Final answer:", BikeFrame("{title}", "{publisher_title}").analyze_headline())
+```
+Generate the expected output of all print() calls. Do not care about unimplemented methods.
+"""
+
+# Trace lines whose free text is shortened in the lean examples. The rationale keeps its first and last
+# sentences: the reason and the perception it concludes.
+LEAN_SHORTENED_LINES = {
+    "Is the headline discussing an accident?": "first",
+    "News Coverage Analysis Result:": "first",
+    "Intermediate Rationale:": "ends",
+}
+
+
+def shorten_line(line, prefix, keep):
+    text = line[len(prefix):].strip()
+    sentences = text.split(". ")
+    if len(sentences) == 1:
+        return line
+    if keep == "first":
+        return f"{prefix} {sentences[0]}."
+    return f"{prefix} {sentences[0]}. {sentences[-1]}"
+
+
+def shorten_trace(answer):
+    '''
+    Keep every step of an example trace but cut its long free-text lines to one sentence.
+    '''
+    lines = []
+    for line in answer.split("\n"):
+        for prefix, keep in LEAN_SHORTENED_LINES.items():
+            if line.startswith(prefix):
+                line = shorten_line(line.rstrip(), prefix, keep)
+                break
+        lines.append(line)
+    return "\n".join(lines)
+
+
+LEAN_EXAMPLES = [(title, publisher_title, shorten_trace(answer)) for title, publisher_title, answer in FEW_SHOT_EXAMPLES]
+
+
+DEFAULT_TEMPLATE = PromptTemplate()
+LEAN_TEMPLATE = PromptTemplate(LEAN_SYSTEM_MESSAGE, LEAN_EXAMPLES, LEAN_USER_TEMPLATE)
+PROMPT_PROFILES = {"full": DEFAULT_TEMPLATE, "lean": LEAN_TEMPLATE}
+
+
+def generate_prompt(json_data, profile="full"):
+    return PROMPT_PROFILES[profile].render(json_data)
@@ -0,0 +1,146 @@
+import time
+from collections import Counter
+
+from batch_runner import BatchRunner, make_client
+from token_budget import MODEL_PRICES, estimate_cost
+from trace_parser import parse_trace
+
+DEFAULT_TIERS = ("gpt-4o-mini", "gpt-4o")
+
+
+class CacheOnlyClient:
+    '''
+    Stand-in client for offline simulation: every request that misses the response cache fails.
+    '''
+    def __init__(self):
+        self.chat = self
+        self.completions = self
+
+    async def create(self, **kwargs):
+        raise LookupError(f"no cached response for {kwargs.get('model')}")
+
+
+def inconsistency(text, labels):
+    '''
+    Why a parsed answer contradicts itself, or None. The final tuple is checked on its own
+    (no accident must mean an Unknown fault) and against the accident and fault steps of its trace.
+    '''
+    accident, fault, _ = labels
+    if accident == "No" and fault != "Unknown":
+        return "no accident but fault assigned"
+    trace = parse_trace(text)
+    steps = [record.value[0] for record in trace.by_kind("accident") if record.value[0] is not None]
+    if steps and steps[-1] != accident:
+        return "accident step disagrees with final answer"
+    steps = [record.value for record in trace.by_kind("fault") if record.value is not None]
+    if accident == "Yes" and steps and steps[-1] != fault:
+        return "fault step disagrees with final answer"
+    return None
+
+
+def build_tiers(models=DEFAULT_TIERS, client=None, cache=None, **kwargs):
+    '''
+    One BatchRunner per model, cheapest first, sharing a client and response cache (cache keys include the model).
+    '''
+    return [BatchRunner(client=client, model=model, cache=cache, **kwargs) for model in models]
+
+
+def default_confidence(result):
+    '''
+    The confidence a tier attached to its result: `confidence` when present, else the vote `agreement`
+    of a VotingRunner tier, else None (no signal, never escalates on its own).
+    '''
+    value = result.get("confidence")
+    return result.get("agreement") if value is None else value
+
+
+class CascadeRunner(BatchRunner):
+    '''
+    Sends each prompt to a chain of runners, cheapest first, and only escalates to the next tier when
+    the answer fails to parse, contradicts itself, or its confidence is below `threshold`. Each tier is
+    a BatchRunner (or subclass) with its own model, client, cache and sampling parameters; the cascade
+    itself handles the fast path, token cap and metrics like any BatchRunner.
+    With `offline=True` tiers without a client answer from their response cache only, so a cascade
+    can be replayed against cached responses without network access.
+    '''
+    def __init__(self, tiers, threshold=None, confidence=default_confidence, offline=False, **kwargs):
+        super().__init__(**kwargs)
+        self.tiers = list(tiers)
+        self.threshold = threshold
+        self.confidence = confidence
+        self.offline = offline
+        self.tier_stats = [
+            {"model": tier.model, "calls": 0, "accepted": 0, "cached": 0, "errors": 0, "seconds": 0.0,
+             "escalations": Counter()}
+            for tier in self.tiers
+        ]
+
+    def escalation_reason(self, result):
+        if "error" in result:
+            return "error"
+        labels = result.get("labels")
+        if labels is None:
+            return "unparsed"
+        if inconsistency(result.get("response") or "", labels) is not None:
+            return "inconsistent"
+        if self.threshold is not None:
+            confidence = self.confidence(result)
+            if confidence is not None and confidence < self.threshold:
+                return "low_confidence"
+        return None
+
+    async def call(self, messages, result):
+        escalations = []
+        for level, tier in enumerate(self.tiers):
+            attempt = {"original_index": result["original_index"]}
+            start = time.perf_counter()
+            await tier.call(messages, attempt)
+            stats = self.tier_stats[level]
+            stats["calls"] += 1
+            stats["seconds"] += time.perf_counter() - start
+            stats["cached"] += bool(attempt.get("cached"))
+            stats["errors"] += "error" in attempt
+
+            reason = self.escalation_reason(attempt)
+            if reason is None or level == len(self.tiers) - 1:
+                stats["accepted"] += 1
+                break
+            stats["escalations"][reason] += 1
+            escalations.append({"model": tier.model, "reason": reason, "labels": attempt.get("labels")})
+        result.update((key, value) for key, value in attempt.items() if key != "original_index")
+        result["tier"] = tier.model
+        if escalations:
+            result["escalations"] = escalations
+
+    async def run(self, rows, on_result=None):
+        for tier in self.tiers:
+            if tier.client is None and self.offline:
+                tier.client = CacheOnlyClient()
+                tier.max_retries = 0  # a cache miss will not resolve itself
+            elif tier.client is None:
+                tier.client = make_client()
+        self.client = self.tiers[0].client
+        return await super().run(rows, on_result)
+
+    def stats(self, input_tokens_per_call=None, output_tokens_per_call=None):
+        '''
+        Per-tier calls, acceptances, escalation reasons and mean latency. Given per-call token
+        estimates, also the estimated cost per headline for the cascade and for the last tier alone.
+        '''
+        tiers = []
+        for stats in self.tier_stats:
+            entry = dict(stats, escalations=dict(stats["escalations"]))
+            entry["mean_seconds"] = stats["seconds"] / stats["calls"] if stats["calls"] else 0.0
+            tiers.append(entry)
+        report = {"rows": self.tier_stats[0]["calls"], "tiers": tiers}
+        if input_tokens_per_call is not None and report["rows"]:
+            def cost(model, calls):
+                if model not in MODEL_PRICES:
+                    return None
+                return estimate_cost(input_tokens_per_call * calls, output_tokens_per_call * calls, model)
+
+            costs = [cost(stats["model"], stats["calls"]) for stats in self.tier_stats]
+            if None not in costs:
+                report["cost_per_headline"] = sum(costs) / report["rows"]
+                report["last_tier_only_cost_per_headline"] = cost(self.tier_stats[-1]["model"], 1)
+        return report
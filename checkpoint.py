@@ -0,0 +1,109 @@
+import os
+import json
+import warnings
+
+
+def failed_path_for(results_path):
+    root, ext = os.path.splitext(results_path)
+    return f"{root}.failed{ext or '.jsonl'}"
+
+
+class ResultsJournal:
+    '''
+    Append-only results JSONL keyed by `original_index`. Opening the journal scans the existing file to
+    build the set of completed indices, so a restarted job only redoes the missing rows. Results with
+    parsed labels are appended to `path`; errors and unparsable responses are appended to a separate
+    failed file, which keeps the history of every run, and are retried automatically on the next one.
+    Both files are fsynced every `fsync_every` records.
+    '''
+    def __init__(self, path, fsync_every=100, failed_path=None):
+        self.path = path
+        self.failed_path = failed_path or failed_path_for(path)
+        self.fsync_every = fsync_every
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.completed = self._scan()
+        self.written = 0
+        self.failed = 0
+        self._unsynced = 0
+        self._results = open(path, "a", encoding="utf-8")
+        self._failures = open(self.failed_path, "a", encoding="utf-8")
+
+    def _scan(self):
+        '''
+        Collect completed indices and cut off a partially written last line left by a crash. Complete
+        lines that cannot be read are skipped with a warning, so the results after them are kept.
+        '''
+        completed = set()
+        if not os.path.exists(self.path):
+            return completed
+        good_end = 0
+        corrupt = 0
+        with open(self.path, "rb") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                good_end += len(line)
+                try:
+                    completed.add(json.loads(line)["original_index"])
+                except (ValueError, KeyError, TypeError):
+                    corrupt += 1
+        if corrupt:
+            warnings.warn(f"skipped {corrupt} unreadable lines in {self.path}; their rows will be redone")
+        if good_end != os.path.getsize(self.path):
+            os.truncate(self.path, good_end)
+        return completed
+
+    def pending(self, rows):
+        '''
+        Rows that have no completed result yet.
+        '''
+        for row in rows:
+            if row.get("original_index") not in self.completed:
+                yield row
+
+    def record(self, result):
+        if "error" in result or not result.get("labels"):
+            if "error" not in result:
+                result = dict(result, error="response could not be parsed")
+            self._failures.write(json.dumps(result, ensure_ascii=False) + "\n")
+            self.failed += 1
+        else:
+            self._results.write(json.dumps(result, ensure_ascii=False) + "\n")
+            self.completed.add(result["original_index"])
+            self.written += 1
+        self._unsynced += 1
+        if self._unsynced >= self.fsync_every:
+            self.sync()
+
+    def sync(self):
+        for f in (self._results, self._failures):
+            f.flush()
+            os.fsync(f.fileno())
+        self._unsynced = 0
+
+    def close(self):
+        self.sync()
+        self._results.close()
+        self._failures.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+async def run_job(rows, results_path, runner, fsync_every=100):
+    '''
+    Resumable classification job: skip rows already in `results_path`, run the rest with `runner`
+    (a BatchRunner) and append each result as it finishes.
+    Returns:
+        dict: counts of rows skipped as already done, newly written and failed.
+    '''
+    with ResultsJournal(results_path, fsync_every) as journal:
+        rows = list(rows)
+        todo = list(journal.pending(rows))
+        await runner.run(todo, on_result=journal.record)
+        return {"skipped": len(rows) - len(todo), "written": journal.written, "failed": journal.failed,
+                "failed_path": journal.failed_path}
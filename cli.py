@@ -0,0 +1,333 @@
+'''
+BikeFrame command-line interface.
+
+    python cli.py build-prompts --limit 5 --out prompts.jsonl
+    python cli.py count-tokens --profile lean --max-input-tokens 6000
+    python cli.py run --out results/all_data.jsonl --concurrency 32 --cache cache/responses.sqlite
+    python cli.py evaluate results/all_data.jsonl
+    python cli.py export-batch --out-dir batch
+    python cli.py import-batch batch/output_000.jsonl --out results/batch.jsonl
+    python cli.py search '"hit and run" AND publisher-category:mainstream' --by publisher
+
+Only the standard library, the prompt module and the dataset reader are imported up front; openai,
+dotenv, tiktoken and numpy are imported inside the subcommands that need them, so prompt-only
+commands start without paying for the SDK.
+'''
+import sys
+import json
+import argparse
+from itertools import islice
+
+from bike_frame import PROMPT_PROFILES
+from dataset import DEFAULT_DATA_PATH, load_dataset
+from token_budget import DEFAULT_MODEL
+
+# "trace" prints the full chain-of-code trace; the others answer in JSON (see structured_output.VERBOSITY_KEYS).
+OUTPUT_MODES = ("trace", "labels", "brief", "steps")
+DEFAULT_CALIBRATION_PATH = "data/confidence_calibration.json"  # same default as confidence.py, without importing numpy
+DEFAULT_INDEX_PATH = "data/headline_index.json.gz"  # same default as headline_index.py, without importing numpy
+
+
+def read_rows(args):
+    return islice(load_dataset(args.data), args.limit)
+
+
+def open_output(path):
+    return open(path, "w", encoding="utf-8") if path and path != "-" else sys.stdout
+
+
+def write_json(value):
+    json.dump(value, sys.stdout, indent=2, ensure_ascii=False)
+    sys.stdout.write("\n")
+
+
+def prompt_template(args):
+    '''
+    The template for --output: the printed-trace profile, or a structured JSON template.
+    '''
+    if getattr(args, "output", "trace") == "trace":
+        return PROMPT_PROFILES[args.profile]
+    from structured_output import STRUCTURED_TEMPLATES
+
+    return STRUCTURED_TEMPLATES[args.output]
+
+
+def labels_parser(args):
+    if getattr(args, "output", "trace") == "trace":
+        from trace_parser import final_labels
+
+        return final_labels
+    from structured_output import parse_structured
+
+    return parse_structured
+
+
+def sampling_params(args):
+    template = prompt_template(args)
+    params = template.request_params(not args.no_schema) if hasattr(template, "request_params") else {}
+    params["temperature"] = args.temperature
+    if args.max_tokens is not None:
+        params["max_tokens"] = args.max_tokens
+    return params
+
+
+def build_prompts(args):
+    template = prompt_template(args)
+    out = open_output(args.out)
+    try:
+        for row in read_rows(args):
+            out.write(json.dumps({"original_index": row.get("original_index"), "messages": template.render(row)},
+                                 ensure_ascii=False) + "\n")
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+
+def count_tokens(args):
+    from token_budget import TokenCounter, dataset_token_counts, dry_run_report
+
+    counter = TokenCounter(args.model, prompt_template(args))
+    counts = dataset_token_counts(args.data, counter, args.limit, cache=not args.no_token_cache)
+    report = dry_run_report(read_rows(args), counter, args.output_tokens, args.max_input_tokens, counts=counts)
+    if not args.per_row:
+        del report["per_row"]
+    write_json(report)
+
+
+def run(args):
+    import asyncio
+    from batch_runner import BatchRunner, make_client
+    from pipeline import run_pipeline
+
+    if args.confidence:
+        # ConfidenceRunner needs the logprobs of a fresh, non-streamed response.
+        for option, value in (("--tokens-per-minute", args.tokens_per_minute), ("--stream", args.stream),
+                              ("--cache", args.cache)):
+            if value:
+                sys.exit(f"--confidence cannot be combined with {option}")
+    cache = None
+    if args.cache:
+        from response_cache import ResponseCache
+
+        cache = ResponseCache(args.cache)
+    pre_classifier = None
+    if args.fast_path is not None:
+        from fast_path import FastPathClassifier
+
+        pre_classifier = FastPathClassifier(args.fast_path)
+    metrics = None
+    if args.metrics or args.prometheus:
+        from instrumentation import Metrics
+
+        metrics = Metrics()
+    runner_class, extra = BatchRunner, {}
+    if args.tokens_per_minute:
+        from scheduler import ScheduledRunner
+
+        runner_class, extra = ScheduledRunner, {"tokens_per_minute": args.tokens_per_minute}
+    if args.confidence:
+        from confidence import Calibration, ConfidenceRunner
+
+        runner_class, extra = ConfidenceRunner, {"calibration": Calibration.load(args.calibration)}
+    template = prompt_template(args)
+    token_counter = None
+    if args.max_input_tokens is not None or args.tokens_per_minute:
+        from token_budget import TokenCounter
+
+        token_counter = TokenCounter(args.model, template)
+    runner = runner_class(
+        client=make_client(base_url=args.base_url), model=args.model, concurrency=args.concurrency,
+        max_retries=args.max_retries, prompt=template.render, parser=labels_parser(args), cache=cache,
+        stream=args.stream, pre_classifier=pre_classifier, max_input_tokens=args.max_input_tokens,
+        token_counter=token_counter, metrics=metrics, **extra, **sampling_params(args),
+    )
+    try:
+        if args.cprofile:
+            from instrumentation import profiled
+
+            with profiled(args.cprofile, stream=sys.stderr):
+                stats = asyncio.run(run_pipeline(read_rows(args), args.out, runner, fsync_every=args.fsync_every))
+        else:
+            stats = asyncio.run(run_pipeline(read_rows(args), args.out, runner, fsync_every=args.fsync_every))
+    finally:
+        if cache is not None:
+            cache.close()
+    if args.metrics:
+        metrics.write_json(args.metrics)
+    if args.prometheus:
+        metrics.write_prometheus(args.prometheus)
+    write_json(stats)
+
+
+def evaluate(args):
+    from evaluation import evaluate, load_predictions
+
+    rows = list(load_dataset(args.data))
+    predictions = load_predictions(args.predictions)
+    scored = rows if args.all_rows else [row for row in rows if row.get("original_index") in predictions]
+    report = evaluate(scored, predictions, n_resamples=args.resamples, seed=args.seed,
+                      by_publisher=args.by_publisher)
+    report["coverage"] = {"rows": len(rows), "predicted": sum(row.get("original_index") in predictions for row in rows),
+                          "scored": len(scored)}
+    write_json(report)
+
+
+def calibrate(args):
+    from confidence import Calibration, calibration_report
+    from evaluation import read_results
+
+    rows = list(load_dataset(args.data))
+    results = list(read_results(args.results))
+    calibration = Calibration.fit(rows, results)
+    calibration.save(args.out)
+    write_json(calibration_report(rows, results, calibration))
+
+
+def search(args):
+    from headline_index import HeadlineIndex
+
+    index = HeadlineIndex.load(args.index)
+    if index.add(read_rows(args)) and args.index:
+        index.save(args.index)
+    try:
+        ids = index.search(args.query)
+    except ValueError as e:
+        sys.exit(f"bad query: {e}")
+    report = {"query": args.query, "matches": len(ids)}
+    if args.by:
+        predictions = None
+        if args.predictions:
+            from evaluation import load_predictions
+
+            predictions = load_predictions(args.predictions)
+        report["counts"] = index.counts(ids, args.by, args.task, predictions)
+    if args.ids:
+        report["original_index"] = ids
+    write_json(report)
+
+
+def export_batch(args):
+    from batch_api import export_batch
+
+    paths = export_batch(read_rows(args), args.model, out_dir=args.out_dir,
+                         prompt=prompt_template(args).render, **sampling_params(args))
+    write_json(paths)
+
+
+def import_batch(args):
+    from batch_api import import_batch_results
+
+    rows = list(read_rows(args)) if args.data else None
+    results = import_batch_results(args.results, rows, labels_parser(args))
+    out = open_output(args.out)
+    try:
+        for result in results:
+            out.write(json.dumps(result, ensure_ascii=False) + "\n")
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="bikeframe", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    def command(name, handler, help, data=True, model=False, prompt=False, sampling=False):
+        sub = commands.add_parser(name, help=help)
+        sub.set_defaults(handler=handler)
+        if data:
+            sub.add_argument("--data", default=DEFAULT_DATA_PATH, help="JSONL dataset, optionally gzipped")
+            sub.add_argument("--limit", type=int, default=None, help="only use the first N rows")
+        if model:
+            sub.add_argument("--model", default=DEFAULT_MODEL)
+        if model or prompt:
+            sub.add_argument("--profile", choices=list(PROMPT_PROFILES), default="full")
+            output_option(sub)
+        if sampling:
+            sub.add_argument("--temperature", type=float, default=0.0)
+            sub.add_argument("--max-tokens", type=int, default=None, help="completion cap (default: set by --output)")
+            sub.add_argument("--no-schema", action="store_true",
+                             help="do not send the JSON schema with structured --output modes")
+        return sub
+
+    def output_option(sub):
+        sub.add_argument("--output", choices=OUTPUT_MODES, default="trace",
+                         help="printed chain-of-code trace, or a JSON answer at this verbosity")
+
+    sub = command("build-prompts", build_prompts, "write the chat messages for every row as JSONL", prompt=True)
+    sub.add_argument("--out", default="-", help="output path (default: stdout)")
+
+    sub = command("count-tokens", count_tokens, "count input tokens and estimate cost without calling the API",
+                  model=True)
+    sub.add_argument("--max-input-tokens", type=int, default=None)
+    sub.add_argument("--output-tokens", type=int, default=None, help="expected output tokens per row")
+    sub.add_argument("--per-row", action="store_true", help="include the token count of every row")
+    sub.add_argument("--no-token-cache", action="store_true",
+                     help="recount instead of reusing the counts cached next to the dataset")
+
+    sub = command("run", run, "classify the dataset, appending results to a resumable JSONL", model=True,
+                  sampling=True)
+    sub.add_argument("--out", required=True, help="results JSONL; rows already in it are skipped")
+    sub.add_argument("--base-url", default=None, help="OpenAI-compatible endpoint, e.g. a local mock server")
+    sub.add_argument("--concurrency", type=int, default=16, help="maximum requests in flight")
+    sub.add_argument("--max-retries", type=int, default=3)
+    sub.add_argument("--tokens-per-minute", type=int, default=None,
+                     help="pace requests to this TPM quota with adaptive concurrency")
+    sub.add_argument("--max-input-tokens", type=int, default=None)
+    sub.add_argument("--cache", default=None, help="SQLite response cache path")
+    sub.add_argument("--stream", action="store_true", help="stop generation once the final answer is parsed")
+    sub.add_argument("--fast-path", type=float, nargs="?", const=0.85, default=None, metavar="THRESHOLD",
+                     help="settle obvious headlines locally at this rule confidence")
+    sub.add_argument("--fsync-every", type=int, default=100)
+    sub.add_argument("--metrics", default=None, help="write per-stage latency and counter summary JSON here")
+    sub.add_argument("--prometheus", default=None, help="write the metrics in Prometheus text format here")
+    sub.add_argument("--cprofile", default=None, help="profile the run and dump cProfile stats here")
+    sub.add_argument("--confidence", action="store_true",
+                     help="request logprobs and add calibrated per-label probabilities to each result")
+    sub.add_argument("--calibration", default=DEFAULT_CALIBRATION_PATH, help="temperatures fitted by `calibrate`")
+
+    sub = command("evaluate", evaluate, "score a results JSONL against the annotations", data=False)
+    sub.add_argument("predictions", help="results JSONL written by `run` or `import-batch`")
+    sub.add_argument("--data", default=DEFAULT_DATA_PATH)
+    sub.add_argument("--resamples", type=int, default=2000, help="bootstrap resamples (0 to skip the CI)")
+    sub.add_argument("--seed", type=int, default=0)
+    sub.add_argument("--by-publisher", action="store_true", help="include per-publisher macro F1")
+    sub.add_argument("--all-rows", action="store_true",
+                     help="score every dataset row, counting rows without a result as unparsed")
+
+    sub = command("calibrate", calibrate, "fit confidence temperatures on a `run --confidence` results JSONL",
+                  data=False)
+    sub.add_argument("results", help="results JSONL with label_logprobs")
+    sub.add_argument("--data", default=DEFAULT_DATA_PATH, help="annotated dataset")
+    sub.add_argument("--out", default=DEFAULT_CALIBRATION_PATH, help="where to save the temperatures")
+
+    sub = command("search", search, "query the headline index; new dataset rows are indexed first")
+    sub.add_argument("query", help='e.g. \'"hit and run" AND publisher-category:mainstream NOT fault:cyclist\'')
+    sub.add_argument("--index", default=DEFAULT_INDEX_PATH, help="saved index, updated in place (\"\" to keep in memory)")
+    sub.add_argument("--by", choices=["publisher", "publisher-category", "accident", "fault", "perception"],
+                     default=None, help="group the matches and count their labels")
+    sub.add_argument("--task", choices=["accident", "fault", "perception"], default="perception",
+                     help="task whose labels are counted with --by")
+    sub.add_argument("--predictions", default=None, help="count predicted labels from this results JSONL")
+    sub.add_argument("--ids", action="store_true", help="list the original_index of every match")
+
+    sub = command("export-batch", export_batch, "write OpenAI Batch API request files", model=True, sampling=True)
+    sub.add_argument("--out-dir", default="batch")
+
+    sub = command("import-batch", import_batch, "convert Batch API output files into a results JSONL", data=False)
+    sub.add_argument("results", nargs="+", help="Batch API output files")
+    sub.add_argument("--data", default=None, help="dataset to order results by and report missing rows")
+    sub.add_argument("--limit", type=int, default=None)
+    sub.add_argument("--out", default="-", help="output path (default: stdout)")
+    output_option(sub)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    args.handler(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+import os
+import re
+import json
+import math
+import time
+
+import numpy as np
+
+from batch_runner import BatchRunner, response_text, response_usage
+from dataset import GOLD_KEYS
+from trace_parser import FINAL_ANSWER, LABELS, TASKS
+
+DEFAULT_CALIBRATION_PATH = "data/confidence_calibration.json"
+# Candidate temperatures for the calibration grid search.
+TEMPERATURES = np.logspace(-1, 1.5, 251)
+TOKEN_STRIP = " \t\n'\"`()[],:"
+
+
+def token_logprobs(response):
+    '''
+    The per-token logprob entries of the first choice (dicts with token, logprob and top_logprobs),
+    from an SDK object or a plain dict, or None when the response has none.
+    '''
+    if isinstance(response, dict):
+        logprobs = response["choices"][0].get("logprobs") or {}
+        return logprobs.get("content")
+    logprobs = getattr(response.choices[0], "logprobs", None)
+    if logprobs is None or logprobs.content is None:
+        return None
+    return [
+        {"token": entry.token, "logprob": entry.logprob,
+         "top_logprobs": [{"token": top.token, "logprob": top.logprob} for top in entry.top_logprobs or []]}
+        for entry in logprobs.content
+    ]
+
+
+def label_spans(text, labels):
+    '''
+    Character offsets where each label of the final answer starts: in the last "Final answer:" tuple of a
+    printed trace, or at the "accident" / "fault" / "perception" values of a JSON answer.
+    '''
+    position = text.rfind(FINAL_ANSWER)
+    if position != -1:
+        starts = []
+        for label in labels:
+            position = text.find(label, position)
+            if position == -1:
+                return None
+            starts.append(position)
+            position += len(label)
+        return starts
+    starts = []
+    for task, label in zip(TASKS, labels):
+        match = None
+        for match in re.finditer(rf'"{task}"\s*:\s*"', text):
+            pass
+        if match is None:
+            return None
+        starts.append(match.end())
+    return starts
+
+
+def candidate_logprobs(entry, task):
+    '''
+    Log-probability of each label of `task` at the token where the predicted label starts, read from
+    the token's top alternatives. Alternatives spelling the same label are summed; labels outside the
+    top alternatives get the lowest listed logprob, an upper bound.
+    '''
+    alternatives = entry.get("top_logprobs") or [{"token": entry["token"], "logprob": entry["logprob"]}]
+    mass = {}
+    for alternative in alternatives:
+        piece = alternative["token"].strip(TOKEN_STRIP).lower()
+        if not piece:
+            continue
+        for label in LABELS[task]:
+            if label.lower().startswith(piece):
+                mass[label] = mass.get(label, 0.0) + math.exp(alternative["logprob"])
+                break
+    floor = min(alternative["logprob"] for alternative in alternatives)
+    return {label: math.log(mass[label]) if label in mass else floor for label in LABELS[task]}
+
+
+def label_logprobs(text, labels, entries):
+    '''
+    {task: {label: logprob}} at the final answer's label tokens, or None when they cannot be located.
+    '''
+    if not labels or not entries:
+        return None
+    starts = label_spans(text, labels)
+    if starts is None:
+        return None
+    offsets = []
+    position = 0
+    for entry in entries:
+        offsets.append(position)
+        position += len(entry["token"])
+    result = {}
+    for task, start in zip(TASKS, starts):
+        i = int(np.searchsorted(offsets, start, side="right")) - 1
+        if i < 0:
+            return None
+        result[task] = candidate_logprobs(entries[i], task)
+    return result
+
+
+def softmax(logits, temperature=1.0):
+    scaled = np.asarray(logits, dtype=np.float64) / temperature
+    scaled -= scaled.max(axis=-1, keepdims=True)
+    weights = np.exp(scaled)
+    return weights / weights.sum(axis=-1, keepdims=True)
+
+
+class Calibration:
+    '''
+    Per-task softmax temperatures that turn label logprobs into calibrated probabilities.
+    Temperature 1 is the renormalised raw model probability.
+    '''
+    def __init__(self, temperatures=None):
+        self.temperatures = dict.fromkeys(TASKS, 1.0)
+        self.temperatures.update(temperatures or {})
+
+    def probabilities(self, logprobs):
+        '''
+        {task: {label: probability}} for the {task: {label: logprob}} of one answer.
+        '''
+        return {
+            task: dict(zip(LABELS[task], softmax([logprobs[task][label] for label in LABELS[task]],
+                                                  self.temperatures[task]).round(6).tolist()))
+            for task in TASKS if task in logprobs
+        }
+
+    @classmethod
+    def fit(cls, rows, results):
+        '''
+        Fit each task's temperature by minimising the negative log-likelihood of the gold labels of
+        `rows` (e.g. data/all_data.json) under the `label_logprobs` stored in matching `results`.
+        '''
+        by_index = {result["original_index"]: result for result in results if result.get("label_logprobs")}
+        temperatures = {}
+        for task in TASKS:
+            logits, gold = [], []
+            for row in rows:
+                result = by_index.get(row.get("original_index"))
+                if result is None or row.get(GOLD_KEYS[task]) not in LABELS[task]:
+                    continue
+                logits.append([result["label_logprobs"][task][label] for label in LABELS[task]])
+                gold.append(LABELS[task].index(row[GOLD_KEYS[task]]))
+            if not logits:
+                continue
+            logits, gold = np.asarray(logits), np.asarray(gold)
+            nll = [negative_log_likelihood(softmax(logits, t), gold) for t in TEMPERATURES]
+            temperatures[task] = float(TEMPERATURES[int(np.argmin(nll))])
+        return cls(temperatures)
+
+    @classmethod
+    def load(cls, path=DEFAULT_CALIBRATION_PATH):
+        if not path or not os.path.exists(path):
+            return cls()
+        with open(path, encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def save(self, path=DEFAULT_CALIBRATION_PATH):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.temperatures, f, indent=2)
+
+
+def negative_log_likelihood(probabilities, gold):
+    return float(-np.mean(np.log(np.maximum(probabilities[np.arange(len(gold)), gold], 1e-12))))
+
+
+def expected_calibration_error(confidence, correct, n_bins=10):
+    confidence, correct = np.asarray(confidence), np.asarray(correct, dtype=np.float64)
+    bins = np.minimum((confidence * n_bins).astype(int), n_bins - 1)
+    error = 0.0
+    for b in range(n_bins):
+        members = bins == b
+        if members.any():
+            error += members.mean() * abs(confidence[members].mean() - correct[members].mean())
+    return float(error)
+
+
+def calibration_report(rows, results, calibration):
+    '''
+    Per task: rows scored, accuracy, and the negative log-likelihood and expected calibration error of the
+    predicted label's probability, raw (temperature 1) and calibrated.
+    '''
+    by_index = {result["original_index"]: result for result in results if result.get("label_logprobs")}
+    raw = Calibration()
+    report = {}
+    for task in TASKS:
+        labels = LABELS[task]
+        pairs = [(by_index[row.get("original_index")], labels.index(row[GOLD_KEYS[task]])) for row in rows
+                 if row.get("original_index") in by_index and row.get(GOLD_KEYS[task]) in labels]
+        if not pairs:
+            continue
+        logits = np.asarray([[result["label_logprobs"][task][label] for label in labels] for result, _ in pairs])
+        gold = np.asarray([g for _, g in pairs])
+        entry = {"n": len(pairs)}
+        for name, model in (("raw", raw), ("calibrated", calibration)):
+            probabilities = softmax(logits, model.temperatures[task])
+            predicted = probabilities.argmax(axis=1)
+            entry[name] = {
+                "temperature": model.temperatures[task],
+                "accuracy": float((predicted == gold).mean()),
+                "nll": negative_log_likelihood(probabilities, gold),
+                "ece": expected_calibration_error(probabilities.max(axis=1), predicted == gold),
+            }
+        report[task] = entry
+    return report
+
+
+class ConfidenceRunner(BatchRunner):
+    '''
+    BatchRunner that requests token logprobs and scores its own answer in the same call. Each result
+    gets `label_logprobs` (raw, for refitting), calibrated `label_probabilities`, and `confidence`, the
+    lowest calibrated probability among the three predicted labels; CascadeRunner escalates on it and
+    reviewers can sort by it. `stream` and `cache` are not supported: cached entries carry no logprobs.
+    '''
+    def __init__(self, *args, calibration=None, top_logprobs=5, **kwargs):
+        super().__init__(*args, logprobs=True, top_logprobs=top_logprobs, **kwargs)
+        if self.stream or self.cache is not None:
+            raise ValueError("ConfidenceRunner supports neither stream nor cache")
+        self.calibration = calibration if calibration is not None else Calibration()
+
+    async def call(self, messages, result):
+        start = time.perf_counter()
+        try:
+            response = await self.with_retries(lambda: self.client.chat.completions.create(
+                model=self.model, messages=messages, **self.params))
+        except Exception as e:
+            result["error"] = f"{type(e).__name__}: {e}"
+            return
+        if self.metrics is not None:
+            self.metrics.observe("request", time.perf_counter() - start)
+            self.metrics.record_usage(response_usage(response))
+        result["response"] = response_text(response)
+        result["labels"] = self.parse(result["response"])
+        logprobs = label_logprobs(result["response"], result["labels"], token_logprobs(response))
+        if logprobs is None:
+            return
+        probabilities = self.calibration.probabilities(logprobs)
+        result["label_logprobs"] = logprobs
+        result["label_probabilities"] = probabilities
+        result["confidence"] = min(probabilities[task][label] for task, label in zip(TASKS, result["labels"]))
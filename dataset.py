@@ -0,0 +1,27 @@
+import gzip
+import json
+
+DEFAULT_DATA_PATH = "data/all_data.json"
+GOLD_KEYS = {"accident": "accident_data", "fault": "fault_data", "perception": "perception_annotation"}
+
+
+def open_text(path):
+    '''
+    Open a text file for reading, decompressing it on the fly when it is gzipped.
+    '''
+    with open(path, "rb") as f:
+        gzipped = f.read(2) == b"\x1f\x8b"
+    if gzipped:
+        return gzip.open(path, "rt", encoding="utf-8")
+    return open(path, encoding="utf-8")
+
+
+def load_dataset(path=DEFAULT_DATA_PATH):
+    '''
+    Read the JSON Lines dataset one row at a time. Gzip-compressed files are read directly.
+    '''
+    with open_text(path) as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
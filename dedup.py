@@ -0,0 +1,175 @@
+import re
+import zlib
+
+import numpy as np
+
+from bike_frame import headline_fields, strip_publisher_suffix
+
+NORMALIZE_PATTERN = re.compile(r"[^a-z0-9]+")
+# Mersenne prime for the universal hashes (a * x + b) mod p; a, x < 2**32 keeps the product inside uint64.
+MINHASH_PRIME = np.uint64(2**31 - 1)
+
+
+def normalize_title(title, publisher_title=""):
+    '''
+    Headline without its publisher suffix, lowercased, with punctuation and whitespace collapsed.
+    '''
+    title = strip_publisher_suffix(title, publisher_title)
+    return NORMALIZE_PATTERN.sub(" ", title.lower()).strip()
+
+
+def shingles(text, k=5):
+    '''
+    crc32 hashes of the character k-grams of `text` (the whole text when it is shorter than k).
+    '''
+    if len(text) <= k:
+        return {zlib.crc32(text.encode("utf-8"))} if text else set()
+    return {zlib.crc32(text[i:i + k].encode("utf-8")) for i in range(len(text) - k + 1)}
+
+
+def jaccard(a, b):
+    return len(a & b) / len(a | b) if a or b else 1.0
+
+
+class UnionFind:
+    def __init__(self, n):
+        self.parent = list(range(n))
+
+    def find(self, i):
+        while self.parent[i] != i:
+            self.parent[i] = self.parent[self.parent[i]]
+            i = self.parent[i]
+        return i
+
+    def union(self, i, j):
+        i, j = self.find(i), self.find(j)
+        if i != j:
+            # The smaller position becomes the root so each cluster is represented by its first row.
+            self.parent[max(i, j)] = min(i, j)
+
+
+class Deduplicator:
+    '''
+    Groups exact and near-duplicate headlines (syndicated stories re-published with only the
+    " - Publisher" suffix changed) so each story is classified once. Titles are normalized, shingled
+    into character k-grams and MinHashed; LSH banding proposes candidate pairs, which are kept only
+    when their true shingle Jaccard similarity reaches `threshold`.
+    With `by_publisher=True` (publisher-bias prompts) clusters are split so every publisher still
+    gets its own model call.
+    '''
+    def __init__(self, threshold=0.8, shingle_size=5, n_permutations=64, bands=16, by_publisher=False, seed=0):
+        if n_permutations % bands:
+            raise ValueError("n_permutations must be a multiple of bands")
+        self.threshold = threshold
+        self.shingle_size = shingle_size
+        self.bands = bands
+        self.rows_per_band = n_permutations // bands
+        self.by_publisher = by_publisher
+        rng = np.random.default_rng(seed)
+        self.a = rng.integers(1, MINHASH_PRIME, n_permutations, dtype=np.uint64)
+        self.b = rng.integers(0, MINHASH_PRIME, n_permutations, dtype=np.uint64)
+        self.band_weights = rng.integers(1, 2**63, self.rows_per_band, dtype=np.uint64) | np.uint64(1)
+
+    def signatures(self, shingle_sets):
+        '''
+        MinHash signature matrix, one row of `n_permutations` uint64 values per shingle set.
+        '''
+        signatures = np.full((len(shingle_sets), len(self.a)), MINHASH_PRIME, dtype=np.uint64)
+        for i, hashes in enumerate(shingle_sets):
+            if hashes:
+                x = np.fromiter(hashes, dtype=np.uint64, count=len(hashes))[:, None]
+                signatures[i] = ((self.a * x + self.b) % MINHASH_PRIME).min(axis=0)
+        return signatures
+
+    def buckets(self, signatures):
+        '''
+        Yield arrays of row positions that share an LSH bucket in at least one band.
+        '''
+        for band in range(self.bands):
+            columns = signatures[:, band * self.rows_per_band:(band + 1) * self.rows_per_band]
+            keys = columns @ self.band_weights  # wraps mod 2**64; collisions only add candidates
+            order = np.argsort(keys, kind="stable")
+            boundaries = np.flatnonzero(np.diff(keys[order])) + 1
+            for bucket in np.split(order, boundaries):
+                if len(bucket) > 1:
+                    yield bucket
+
+    def bucket_groups(self, bucket, fields):
+        '''
+        Row positions of an LSH bucket that may be merged: the whole bucket, or one list per publisher
+        with `by_publisher`.
+        '''
+        bucket = [int(i) for i in bucket]
+        if not self.by_publisher:
+            return [bucket]
+        groups = {}
+        for i in bucket:
+            groups.setdefault(fields[i][1], []).append(i)
+        return [group for group in groups.values() if len(group) > 1]
+
+    def clusters(self, rows):
+        '''
+        Partition `rows` into duplicate clusters.
+        Returns:
+            list: one list of row positions per cluster, in input order; the first position is the representative.
+        '''
+        rows = list(rows)
+        fields = [headline_fields(row) for row in rows]
+        shingle_sets = [shingles(normalize_title(*f), self.shingle_size) for f in fields]
+        groups = UnionFind(len(rows))
+        for bucket in self.buckets(self.signatures(shingle_sets)):
+            for group in self.bucket_groups(bucket, fields):
+                # Compare every pair not already joined, so chains (A~B, B~C) merge whatever the order.
+                for k, i in enumerate(group):
+                    if not shingle_sets[i]:
+                        continue
+                    for j in group[:k]:
+                        if shingle_sets[j] and groups.find(i) != groups.find(j) \
+                                and jaccard(shingle_sets[i], shingle_sets[j]) >= self.threshold:
+                            groups.union(i, j)
+
+        members = {}
+        for i in range(len(rows)):
+            members.setdefault(groups.find(i), []).append(i)
+        return list(members.values())
+
+    def report(self, rows):
+        '''
+        How many model calls deduplication saves on `rows`.
+        '''
+        sizes = [len(cluster) for cluster in self.clusters(rows)]
+        n_rows = sum(sizes)
+        return {
+            "rows": n_rows,
+            "clusters": len(sizes),
+            "duplicates": n_rows - len(sizes),
+            "calls_avoided_rate": 1 - len(sizes) / n_rows if n_rows else 0.0,
+            "largest_cluster": max(sizes, default=0),
+        }
+
+    async def run(self, rows, runner, on_result=None):
+        '''
+        Classify one representative per cluster with `runner` and copy its result to every member.
+        Copied results carry `duplicate_of`, the representative's original_index. Results come back in
+        input order; `on_result`, if given, gets a whole cluster's results as soon as its representative
+        finishes, so a journal keeps them if the run is interrupted.
+        '''
+        rows = list(rows)
+        clusters = self.clusters(rows)
+        waiting = {}
+        for cluster in clusters:
+            waiting.setdefault(rows[cluster[0]].get("original_index"), []).append(cluster)
+        results = [None] * len(rows)
+
+        def fan_out(representative):
+            cluster = waiting[representative["original_index"]].pop(0)
+            results[cluster[0]] = representative
+            for i in cluster[1:]:
+                results[i] = dict(representative, original_index=rows[i].get("original_index"),
+                                  duplicate_of=representative["original_index"])
+            if on_result is not None:
+                for i in cluster:
+                    on_result(results[i])
+
+        await runner.run([rows[cluster[0]] for cluster in clusters], on_result=fan_out)
+        return results
@@ -0,0 +1,136 @@
+import json
+
+import numpy as np
+
+from bike_frame import headline_fields
+from dataset import GOLD_KEYS
+from trace_parser import LABELS, TASKS
+
+
+def encode(values, task):
+    '''
+    Integer-code labels for a task; anything outside LABELS[task] (including None) becomes -1.
+    '''
+    codes = {label: i for i, label in enumerate(LABELS[task])}
+    return np.fromiter((codes.get(v, -1) for v in values), dtype=np.int8)
+
+
+def confusion_matrix(gold, predicted, n_labels, groups=None, n_groups=1):
+    '''
+    Confusion counts of shape (n_groups, n_labels, n_labels + 1), in one bincount. Rows are gold labels;
+    the extra last column counts predictions that could not be parsed. Rows without a gold label are ignored.
+    '''
+    keep = gold >= 0
+    gold = gold[keep].astype(np.int64)
+    predicted = np.where(predicted[keep] < 0, n_labels, predicted[keep]).astype(np.int64)
+    cell = gold * (n_labels + 1) + predicted
+    if groups is not None:
+        cell += groups[keep].astype(np.int64) * n_labels * (n_labels + 1)
+    counts = np.bincount(cell, minlength=n_groups * n_labels * (n_labels + 1))
+    return counts.reshape(n_groups, n_labels, n_labels + 1)
+
+
+def f1_scores(confusion, ignore_absent=False):
+    '''
+    Per-label F1, macro F1 and support-weighted F1 for confusion matrices with any leading batch dimensions.
+    With `ignore_absent`, macro F1 only averages labels that occur in the gold or predicted labels,
+    which keeps small slices such as a single publisher comparable.
+    '''
+    n_labels = confusion.shape[-2]
+    true_positive = np.diagonal(confusion[..., :n_labels], axis1=-2, axis2=-1)
+    support = confusion.sum(axis=-1)
+    predicted = confusion[..., :n_labels].sum(axis=-2)
+    denominator = support + predicted
+    f1 = np.divide(2.0 * true_positive, denominator, out=np.zeros(denominator.shape), where=denominator > 0)
+    if ignore_absent:
+        present = (denominator > 0).sum(axis=-1)
+        macro = np.divide(f1.sum(axis=-1), present, out=np.zeros(present.shape), where=present > 0)
+    else:
+        macro = f1.mean(axis=-1)
+    total = support.sum(axis=-1)
+    weighted = np.divide((f1 * support).sum(axis=-1), total, out=np.zeros(total.shape), where=total > 0)
+    return f1, macro, weighted
+
+
+def bootstrap_f1(confusion, n_resamples=2000, alpha=0.05, seed=0):
+    '''
+    Bootstrap confidence interval for macro F1. Resampling rows with replacement only changes the
+    cell counts of the confusion matrix, which follow a multinomial over its cells, so all resamples
+    are drawn in a single array operation instead of re-indexing the rows.
+    '''
+    n = int(confusion.sum())
+    if n == 0:
+        return (0.0, 0.0)
+    rng = np.random.default_rng(seed)
+    samples = rng.multinomial(n, confusion.ravel() / n, size=n_resamples).reshape((n_resamples,) + confusion.shape)
+    _, macro, _ = f1_scores(samples)
+    low, high = np.quantile(macro, [alpha / 2, 1 - alpha / 2])
+    return (float(low), float(high))
+
+
+def align_predictions(rows, predictions):
+    '''
+    Predicted label tuples in row order. `predictions` maps original_index to a label tuple (or None).
+    '''
+    return [predictions.get(row.get("original_index")) or (None, None, None) for row in rows]
+
+
+def evaluate(rows, predictions, n_resamples=2000, alpha=0.05, seed=0, by_publisher=True):
+    '''
+    Score predictions against the annotations of `rows`.
+    Returns:
+        dict: per task, macro / weighted / per-label F1, accuracy, a bootstrap CI for macro F1,
+        the confusion matrix and per-publisher macro F1; plus the average macro F1 over the tasks.
+    '''
+    predicted = align_predictions(rows, predictions)
+    publishers, groups = np.unique([headline_fields(row)[1] for row in rows], return_inverse=True)
+    report = {}
+    for t, task in enumerate(TASKS):
+        n_labels = len(LABELS[task])
+        gold_codes = encode((row.get(GOLD_KEYS[task]) for row in rows), task)
+        predicted_codes = encode((p[t] for p in predicted), task)
+
+        confusion = confusion_matrix(gold_codes, predicted_codes, n_labels)[0]
+        per_label, macro, weighted = f1_scores(confusion)
+        n = int(confusion.sum())
+        task_report = {
+            "n": n,
+            "macro_f1": float(macro),
+            "weighted_f1": float(weighted),
+            "accuracy": float(np.trace(confusion[:, :n_labels]) / n) if n else 0.0,
+            "per_label_f1": dict(zip(LABELS[task], per_label.round(4).tolist())),
+            "macro_f1_ci": bootstrap_f1(confusion, n_resamples, alpha, seed) if n_resamples else None,
+            "confusion": {"labels": list(LABELS[task]) + ["unparsed"], "matrix": confusion.tolist()},
+        }
+        if by_publisher:
+            publisher_confusion = confusion_matrix(gold_codes, predicted_codes, n_labels, groups, len(publishers))
+            _, publisher_macro, _ = f1_scores(publisher_confusion, ignore_absent=True)
+            publisher_n = publisher_confusion.sum(axis=(1, 2))
+            task_report["per_publisher"] = {
+                str(p): {"n": int(c), "macro_f1": round(float(f), 4)}
+                for p, c, f in zip(publishers, publisher_n, publisher_macro) if c
+            }
+        report[task] = task_report
+    report["average_macro_f1"] = float(np.mean([report[task]["macro_f1"] for task in TASKS]))
+    return report
+
+
+def read_results(path):
+    '''
+    Yield the results of a JSONL written by the runner.
+    '''
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def load_predictions(path):
+    '''
+    Read a results JSONL written by the runner into {original_index: labels}.
+    '''
+    predictions = {}
+    for result in read_results(path):
+        labels = result.get("labels")
+        predictions[result["original_index"]] = tuple(labels) if labels else None
+    return predictions
@@ -0,0 +1,144 @@
+import re
+import random
+
+from bike_frame import headline_fields, strip_publisher_suffix
+from dataset import GOLD_KEYS
+from trace_parser import TASKS
+
+# Same patterns as BikeFrame.is_cyclist in the system prompt.
+CYCLIST_PATTERN = re.compile(
+    r'\b([a-zA-Z]*cyclist[s]?|[a-zA-Z]*biker[s]?|bicycle|bike|cycling|bicycling|pedal(ing)?|mountain|road|touring|BMX|[a-zA-Z]*velo)\b',
+    re.IGNORECASE,
+)
+MOTORCYCLE_EXCLUSION = re.compile(r'\b(moto(cyc|bike)|motorbike|motorcycle|biker gang|Harley|chopper|superbike)\b', re.IGNORECASE)
+
+# Any of these means the headline may describe a crash or a conflict, so it always goes to the model.
+ACCIDENT_LEXICON = re.compile(
+    r"\b(crash\w*|collision\w*|collid\w*|struck|strike[sn]?|hit|hits|hit-and-run|run over|knock\w*|mow\w*|"
+    r"kill\w*|die[sd]?|dying|dead|death\w*|fatal\w*|injur\w*|hurt|hospital\w*|critical\w*|wound\w*|"
+    r"accident\w*|smash\w*|rams?|rammed|tragedy|tragic)\b",
+    re.IGNORECASE,
+)
+CONFLICT_LEXICON = re.compile(
+    r"\b(police|arrest\w*|charged?|court|jail\w*|prison|guilty|sentenc\w*|trial|fine[sd]?|ban\w*|illegal\w*|"
+    r"law|rage|assault\w*|attack\w*|abus\w*|threat\w*|stolen|steal\w*|theft|thie\w*|rant\w*|anti-\w+|"
+    r"reckless\w*|danger\w*|menace|clash\w*|row|fury|furious|angry|anger|complain\w*|blame\w*|dope|doping|"
+    r"suspend\w*|investigat\w*|prank\w*|swear\w*|miss(es|ed)?|elud\w*|survey|chance to win)\b",
+    re.IGNORECASE,
+)
+
+# (rule name, pattern, labels, confidence). The defaults are the precision measured on data/all_data.json,
+# the same rows the lexicons were written against, so they are in-sample estimates; calibrate() re-measures
+# them on any annotated rows and holdout_report() scores them on rows they were not measured on.
+RULES = (
+    ("achievement",
+     re.compile(r"\b(wins?|won|winner\w*|medal\w*|gold|silver|bronze|champion\w*|podium|paralympi\w*|"
+                r"world record|raises?|raised|fundrais\w*|charity|honou?r\w*|inspir\w*|celebrat\w*)\b", re.IGNORECASE),
+     ("No", "Unknown", "Positive"), 0.94),
+    ("product",
+     re.compile(r"\b(launch\w*|review\w*|unveil\w*|first look|tested|buyer'?s guide|deals?|tips|"
+                r"gear|groupset|wheelset)\b", re.IGNORECASE),
+     ("No", "Unknown", "Neutral"), 0.88),
+)
+
+
+class FastPathClassifier:
+    '''
+    Settles obvious headlines locally with compiled keyword lexicons instead of a model call.
+    Headlines that do not mention cyclists, mention motorcycles, or contain any accident or conflict
+    keyword are always left to the model.
+    '''
+    def __init__(self, threshold=0.85, rules=RULES):
+        self.threshold = threshold
+        self.rules = [list(rule) for rule in rules]
+
+    def match(self, title):
+        '''
+        Match a headline, without its publisher suffix, against the lexicons.
+        Returns:
+            tuple: (labels, confidence, rule name) for the first matching rule, or None.
+        '''
+        if not CYCLIST_PATTERN.search(title) or MOTORCYCLE_EXCLUSION.search(title):
+            return None
+        if ACCIDENT_LEXICON.search(title) or CONFLICT_LEXICON.search(title):
+            return None
+        for name, pattern, labels, confidence in self.rules:
+            if pattern.search(title):
+                return labels, confidence, name
+        return None
+
+    def __call__(self, row):
+        '''
+        Labels for `row` when a rule fires with at least `threshold` confidence, otherwise None.
+        '''
+        matched = self.match(headline(row))
+        if matched is not None and matched[1] >= self.threshold:
+            return matched[0]
+        return None
+
+    def calibrate(self, rows):
+        '''
+        Set each rule's confidence to its precision on annotated rows (add-one smoothed).
+        '''
+        tallies = {rule[0]: [0, 0] for rule in self.rules}
+        for row in rows:
+            matched = self.match(headline(row))
+            if matched is not None:
+                tally = tallies[matched[2]]
+                tally[0] += matched[0] == gold_labels(row)
+                tally[1] += 1
+        for rule in self.rules:
+            correct, total = tallies[rule[0]]
+            rule[3] = (correct + 1) / (total + 2)
+        return {name: tuple(tally) for name, tally in tallies.items()}
+
+    def report(self, rows):
+        '''
+        How many model calls the fast path would avoid on `rows` and how accurate those answers are.
+        On rows the confidences were calibrated on (including data/all_data.json for the defaults) the
+        accuracy is in-sample and optimistic; use holdout_report() for an out-of-sample figure.
+        '''
+        rows = list(rows)
+        answered = correct = 0
+        per_rule = {}
+        for row in rows:
+            labels = self(row)
+            if labels is None:
+                continue
+            name = self.match(headline(row))[2]
+            hit = labels == gold_labels(row)
+            answered += 1
+            correct += hit
+            stats = per_rule.setdefault(name, {"answered": 0, "correct": 0})
+            stats["answered"] += 1
+            stats["correct"] += hit
+        return {
+            "rows": len(rows),
+            "threshold": self.threshold,
+            "calls_avoided": answered,
+            "calls_avoided_rate": answered / len(rows) if rows else 0.0,
+            "accuracy": correct / answered if answered else None,
+            "per_rule": per_rule,
+        }
+
+    def holdout_report(self, rows, test_fraction=0.3, seed=0):
+        '''
+        Calibrate on a random split of annotated `rows` and report on the held-out `test_fraction`.
+        The rule confidences are left at their calibrated values. The lexicons themselves were written
+        against data/all_data.json, so even this figure may flatter them on that dataset.
+        '''
+        rows = list(rows)
+        random.Random(seed).shuffle(rows)
+        n_test = int(len(rows) * test_fraction)
+        self.calibrate(rows[n_test:])
+        report = self.report(rows[:n_test])
+        report["calibration_rows"] = len(rows) - n_test
+        return report
+
+
+def gold_labels(row):
+    return tuple(row.get(GOLD_KEYS[task]) for task in TASKS)
+
+
+def headline(row):
+    return strip_publisher_suffix(*headline_fields(row))
@@ -0,0 +1,114 @@
+import re
+import zlib
+
+import numpy as np
+
+from bike_frame import FEW_SHOT_EXAMPLES, PromptTemplate, headline_fields
+from dataset import GOLD_KEYS
+from trace_parser import TASKS, final_labels
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+def headline_terms(text):
+    '''
+    Lowercased word unigrams and bigrams of a headline.
+    '''
+    words = TOKEN_PATTERN.findall(text.lower())
+    return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+
+def hashed_counts(texts, n_features):
+    '''
+    Term counts hashed into `n_features` columns (crc32, so stable across processes).
+    '''
+    counts = np.zeros((len(texts), n_features), dtype=np.float32)
+    for i, text in enumerate(texts):
+        columns = [zlib.crc32(term.encode("utf-8")) % n_features for term in headline_terms(text)]
+        np.add.at(counts[i], columns, 1.0)
+    return counts
+
+
+class ExampleIndex:
+    '''
+    Hashed TF-IDF index over few-shot examples, used to pick the examples closest to a headline.
+    '''
+    def __init__(self, examples=FEW_SHOT_EXAMPLES, n_features=2**14):
+        self.examples = list(examples)
+        self.n_features = n_features
+        self.titles = [title for title, _, _ in self.examples]
+        self.labels = [final_labels(answer) for _, _, answer in self.examples]
+
+        counts = hashed_counts(self.titles, n_features)
+        document_frequency = np.count_nonzero(counts, axis=0)
+        self.idf = (np.log((1 + len(self.examples)) / (1 + document_frequency)) + 1).astype(np.float32)
+        self.matrix = self._weight(counts)
+
+    def _weight(self, counts):
+        weights = np.log1p(counts) * self.idf
+        norms = np.linalg.norm(weights, axis=1, keepdims=True)
+        return weights / np.maximum(norms, 1e-12)
+
+    def scores(self, headline):
+        return self.matrix @ self._weight(hashed_counts([headline], self.n_features))[0]
+
+    def select(self, headline, k, balance_on=0):
+        '''
+        Indices of the k most similar examples, taken round-robin across the values of the
+        `balance_on` label (0 = accident, 1 = fault, 2 = perception) so no label is crowded out.
+        An example with exactly the same headline is never selected. The most similar example comes last.
+        '''
+        scores = self.scores(headline)
+        groups = {}
+        for i in np.argsort(-scores, kind="stable"):
+            if self.titles[i] == headline:
+                continue
+            label = self.labels[i][balance_on] if self.labels[i] else None
+            groups.setdefault(label, []).append(int(i))
+
+        queues = sorted(groups.values(), key=lambda group: -scores[group[0]])
+        chosen = []
+        while len(chosen) < k and any(queues):
+            for queue in queues:
+                if queue and len(chosen) < k:
+                    chosen.append(queue.pop(0))
+        return sorted(chosen, key=lambda i: scores[i])
+
+
+def examples_from_results(rows, results):
+    '''
+    Turn annotated dataset rows into extra few-shot examples. A row is used only when the model's
+    trace for it (from a BatchRunner result) ended in exactly the gold labels.
+    '''
+    traces = {r["original_index"]: r["response"] for r in results if r.get("response")}
+    examples = []
+    for row in rows:
+        trace = traces.get(row.get("original_index"))
+        if trace is None:
+            continue
+        gold = tuple(row.get(GOLD_KEYS[task]) for task in TASKS)
+        if final_labels(trace) == gold:
+            title, publisher_title = headline_fields(row)
+            examples.append((title, publisher_title, trace.strip()))
+    return examples
+
+
+class RetrievalPromptTemplate(PromptTemplate):
+    '''
+    Prompt variant that keeps only the k examples most relevant to each headline instead of all 18.
+    The example turns are still built once and shared across rows.
+    '''
+    def __init__(self, k=6, examples=FEW_SHOT_EXAMPLES, n_features=2**14, balance_on=0, **kwargs):
+        super().__init__(examples=examples, **kwargs)
+        self.k = k
+        self.balance_on = balance_on
+        self.index = ExampleIndex(self.examples, n_features)
+        self.pairs = [self.prefix[1 + 2 * i:3 + 2 * i] for i in range(len(self.examples))]
+
+    def render(self, json_data):
+        title, _ = headline_fields(json_data)
+        messages = [self.prefix[0]]
+        for i in self.index.select(title, self.k, self.balance_on):
+            messages.extend(self.pairs[i])
+        messages.append(self.user_message(json_data))
+        return messages
@@ -0,0 +1,278 @@
+import os
+import re
+import gzip
+import json
+
+from bike_frame import headline_fields
+from dataset import DEFAULT_DATA_PATH, GOLD_KEYS, load_dataset, open_text
+from dedup import NORMALIZE_PATTERN, normalize_title
+from trace_parser import TASKS
+
+DEFAULT_INDEX_PATH = "data/headline_index.json.gz"
+# Sites that cover cycling only; every other publisher counts as "mainstream". Pass `categories` to
+# HeadlineIndex to label publishers differently (e.g. "local", "national").
+CYCLING_PUBLISHERS = frozenset({
+    "Cyclist", "road.cc", "Cycling Weekly", "Cyclingnews", "BikeRadar", "Bicycling", "VeloNews", "Velo",
+    "BikeBiz", "Bike Europe", "Cycling Industry News", "Singletrack", "Pinkbike", "Bike Magazine", "CyclingTips",
+    "Escape Collective", "Cycling UK", "Sustrans", "BikePortland", "Streetsblog",
+})
+FIELDS = ("publisher", "publisher-category") + TASKS
+OPERATORS = ("AND", "OR", "NOT")
+# Parentheses, field:"quoted value", field:value, "quoted phrase", or a bare word.
+QUERY_TOKEN = re.compile(r'\s*(?:([()])|([\w-]+):"([^"]*)"|([\w-]+):([^\s()"]+)|"([^"]*)"|([^\s()"]+))')
+
+
+def terms(text):
+    return NORMALIZE_PATTERN.sub(" ", text.lower()).split()
+
+
+def publisher_category(publisher, categories=None):
+    if categories and publisher in categories:
+        return categories[publisher]
+    return "cycling" if publisher in CYCLING_PUBLISHERS else "mainstream"
+
+
+class QueryParser:
+    '''
+    Recursive-descent evaluator for the query language, producing the set of matching documents.
+    NOT binds tightest, then AND (also implied between adjacent operands), then OR:
+
+        "hit and run" AND publisher-category:mainstream
+        (cyclist OR cyclists) NOT perception:negative
+        publisher:"BBC News" accident:yes
+    '''
+    def __init__(self, index, query):
+        self.index = index
+        self.tokens = []
+        position = 0
+        query = query.rstrip()
+        while position < len(query):
+            match = QUERY_TOKEN.match(query, position)
+            if match is None or match.end() == position:
+                raise ValueError(f"cannot parse query at {query[position:]!r}")
+            self.tokens.append(match.groups())
+            position = match.end()
+        self.position = 0
+
+    def peek(self):
+        '''
+        The next parenthesis or bare word, "" for a phrase or field term, None at the end of the query.
+        '''
+        if self.position < len(self.tokens):
+            paren, _, _, _, _, _, word = self.tokens[self.position]
+            return paren or word or ""
+        return None
+
+    def parse(self):
+        if not self.tokens:
+            raise ValueError("empty query")
+        docs = self.parse_or()
+        if self.position < len(self.tokens):
+            raise ValueError(f"unexpected {self.peek()!r} in query")
+        return docs
+
+    def parse_or(self):
+        docs = self.parse_and()
+        while self.peek() == "OR":
+            self.position += 1
+            docs = docs | self.parse_and()
+        return docs
+
+    def parse_and(self):
+        docs = self.parse_not()
+        while self.peek() not in (None, ")", "OR"):
+            if self.peek() == "AND":
+                self.position += 1
+            docs = docs & self.parse_not()
+        return docs
+
+    def parse_not(self):
+        if self.peek() == "NOT":
+            self.position += 1
+            return set(range(len(self.index))) - self.parse_not()
+        return self.parse_atom()
+
+    def parse_atom(self):
+        if self.position == len(self.tokens):
+            raise ValueError("query ends where a term was expected")
+        paren, quoted_field, quoted_value, field, value, phrase, word = self.tokens[self.position]
+        self.position += 1
+        if paren == "(":
+            docs = self.parse_or()
+            if self.peek() != ")":
+                raise ValueError("unbalanced parentheses in query")
+            self.position += 1
+            return docs
+        if paren == ")" or word in OPERATORS:
+            raise ValueError(f"unexpected {paren or word!r} in query")
+        if quoted_field is not None:
+            return self.index.field_docs(quoted_field, quoted_value)
+        if field is not None:
+            return self.index.field_docs(field, value)
+        return self.index.phrase_docs(terms(phrase if phrase is not None else word))
+
+
+class HeadlineIndex:
+    '''
+    Positional inverted index over normalised headline tokens (publisher suffix stripped, lowercased,
+    punctuation dropped, as for deduplication), with postings for each row's publisher, publisher
+    category and annotated labels. Documents are numbered in the order rows are added, so postings
+    stay sorted as new headlines are appended with `add`; queries return original_index values.
+    '''
+    def __init__(self, categories=None):
+        self.categories = dict(categories or {})
+        self.original_index = []
+        self.publishers = []
+        self.publisher_codes = []
+        self.labels = {task: [] for task in TASKS}
+        self.postings = {}  # term -> {doc: [positions]}
+        self.fields = {field: {} for field in FIELDS}  # field -> value -> [docs]
+        self._documents = {}
+        self._publisher_lookup = {}
+
+    def __len__(self):
+        return len(self.original_index)
+
+    def __contains__(self, original_index):
+        return original_index in self._documents
+
+    def add(self, rows):
+        '''
+        Index rows not indexed yet (by original_index). Returns the number of rows added.
+        '''
+        added = 0
+        for row in rows:
+            key = row.get("original_index", len(self))
+            if key in self._documents:
+                continue
+            title, publisher = headline_fields(row)
+            doc = len(self)
+            self._documents[key] = doc
+            self.original_index.append(key)
+            if publisher not in self._publisher_lookup:
+                self._publisher_lookup[publisher] = len(self.publishers)
+                self.publishers.append(publisher)
+            self.publisher_codes.append(self._publisher_lookup[publisher])
+            for position, term in enumerate(normalize_title(title, publisher).split()):
+                self.postings.setdefault(term, {}).setdefault(doc, []).append(position)
+            self._add_fields(doc, publisher, [row.get(GOLD_KEYS[task]) for task in TASKS])
+            added += 1
+        return added
+
+    def _add_fields(self, doc, publisher, labels):
+        values = [publisher, publisher_category(publisher, self.categories)]
+        for task, label in zip(TASKS, labels):
+            self.labels[task].append(label)
+            values.append(label)
+        for field, value in zip(FIELDS, values):
+            if value:
+                self.fields[field].setdefault(value.lower(), []).append(doc)
+
+    def update(self, path=DEFAULT_DATA_PATH):
+        '''
+        Index the rows of a dataset that are not indexed yet, e.g. after new headlines were scraped into it.
+        '''
+        return self.add(load_dataset(path))
+
+    def field_docs(self, field, value):
+        if field not in self.fields:
+            raise ValueError(f"unknown field {field!r}, expected one of {', '.join(FIELDS)}")
+        return set(self.fields[field].get(value.lower(), ()))
+
+    def phrase_docs(self, phrase):
+        '''
+        Documents containing the terms of `phrase` consecutively (a single term is a plain term lookup).
+        '''
+        if not phrase:
+            return set()
+        postings = [self.postings.get(term) for term in phrase]
+        if not all(postings):
+            return set()
+        docs = set(min(postings, key=len))
+        for term_postings in postings:
+            docs.intersection_update(term_postings)
+        if len(phrase) == 1:
+            return docs
+        return {doc for doc in docs if self._has_phrase(doc, postings)}
+
+    @staticmethod
+    def _has_phrase(doc, postings):
+        following = [set(term_postings[doc]) for term_postings in postings[1:]]
+        return any(all(start + k in positions for k, positions in enumerate(following, 1))
+                   for start in postings[0][doc])
+
+    def search(self, query):
+        '''
+        original_index of every row matching `query`, in the order the rows were added. Bare words and
+        "quoted phrases" match headline text; field:value terms match publisher, publisher-category,
+        accident, fault or perception (case-insensitive); combine them with AND, OR, NOT and parentheses.
+        Raises ValueError for a malformed query.
+        '''
+        return [self.original_index[doc] for doc in sorted(QueryParser(self, query).parse())]
+
+    def group_value(self, doc, by):
+        publisher = self.publishers[self.publisher_codes[doc]]
+        if by == "publisher":
+            return publisher
+        if by == "publisher-category":
+            return publisher_category(publisher, self.categories)
+        if by in self.labels:
+            return self.labels[by][doc]
+        raise ValueError(f"cannot group by {by!r}, expected one of {', '.join(FIELDS)}")
+
+    def counts(self, ids, by="publisher-category", task="perception", predictions=None):
+        '''
+        {group: {label: rows}} over the rows `ids` (as returned by `search`). Labels are the
+        predicted labels of `task` when `predictions` ({original_index: labels}, as from
+        evaluation.load_predictions) is given, otherwise the annotations; rows without one count as "missing".
+        '''
+        t = TASKS.index(task)
+        counts = {}
+        for key in ids:
+            doc = self._documents[key]
+            if predictions is not None:
+                labels = predictions.get(key)
+                label = labels[t] if labels else None
+            else:
+                label = self.labels[task][doc]
+            group = counts.setdefault(self.group_value(doc, by) or "missing", {})
+            group[label or "missing"] = group.get(label or "missing", 0) + 1
+        return counts
+
+    def save(self, path=DEFAULT_INDEX_PATH):
+        state = {
+            "categories": self.categories,
+            "original_index": self.original_index,
+            "publishers": self.publishers,
+            "publisher_codes": self.publisher_codes,
+            "labels": self.labels,
+            "postings": {term: [[doc, *positions] for doc, positions in docs.items()]
+                         for term, docs in self.postings.items()},
+        }
+        opener = gzip.open if path.endswith(".gz") else open
+        with opener(path, "wt", encoding="utf-8") as f:
+            json.dump(state, f, ensure_ascii=False, separators=(",", ":"))
+
+    @classmethod
+    def load(cls, path=DEFAULT_INDEX_PATH, categories=None):
+        '''
+        A saved index, or an empty one when `path` does not exist. `categories`, if given, replace the saved ones.
+        '''
+        index = cls(categories)
+        if not path or not os.path.exists(path):
+            return index
+        with open_text(path) as f:
+            state = json.load(f)
+        if categories is None:
+            index.categories = state["categories"]
+        index.original_index = state["original_index"]
+        index.publishers = state["publishers"]
+        index.publisher_codes = state["publisher_codes"]
+        index.postings = {term: {entry[0]: entry[1:] for entry in entries}
+                          for term, entries in state["postings"].items()}
+        index._documents = {key: doc for doc, key in enumerate(index.original_index)}
+        index._publisher_lookup = {publisher: i for i, publisher in enumerate(index.publishers)}
+        labels = state["labels"]
+        for doc, code in enumerate(index.publisher_codes):
+            index._add_fields(doc, index.publishers[code], [labels[task][doc] for task in TASKS])
+        return index
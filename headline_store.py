@@ -0,0 +1,127 @@
+import numpy as np
+
+from bike_frame import headline_fields
+from dataset import DEFAULT_DATA_PATH, GOLD_KEYS, load_dataset
+from trace_parser import LABELS, TASKS
+
+
+class HeadlineStore:
+    '''
+    Columnar in-memory dataset. Headlines live in one UTF-8 buffer addressed by offsets, publishers
+    are interned to int32 codes and each label task is an int8 code array (-1 when not annotated).
+    Rows written with either the `Title`/`Publisher Title` or the `title`/`ptitle` keys are accepted.
+    '''
+    def __init__(self, original_index, buffer, offsets, publisher_codes, publishers, labels):
+        self.original_index = original_index
+        self.buffer = buffer
+        self.offsets = offsets
+        self.publisher_codes = publisher_codes
+        self.publishers = publishers
+        self.labels = labels  # task -> int8 codes into LABELS[task]
+        self._publisher_lookup = {p: i for i, p in enumerate(publishers)}
+
+    @classmethod
+    def from_rows(cls, rows):
+        indices, offsets, publisher_codes = [], [0], []
+        buffer = bytearray()
+        publishers = {}
+        label_codes = {task: {label: i for i, label in enumerate(LABELS[task])} for task in TASKS}
+        labels = {task: [] for task in TASKS}
+        for position, row in enumerate(rows):
+            title, publisher_title = headline_fields(row)
+            indices.append(row.get("original_index", position))
+            buffer += title.encode("utf-8")
+            offsets.append(len(buffer))
+            publisher_codes.append(publishers.setdefault(publisher_title, len(publishers)))
+            for task in TASKS:
+                labels[task].append(label_codes[task].get(row.get(GOLD_KEYS[task]), -1))
+        return cls(
+            np.array(indices, dtype=np.int64),
+            np.frombuffer(bytes(buffer), dtype=np.uint8),
+            np.array(offsets, dtype=np.int64),
+            np.array(publisher_codes, dtype=np.int32),
+            list(publishers),
+            {task: np.array(codes, dtype=np.int8) for task, codes in labels.items()},
+        )
+
+    @classmethod
+    def load(cls, path=DEFAULT_DATA_PATH):
+        return cls.from_rows(load_dataset(path))
+
+    def __len__(self):
+        return len(self.original_index)
+
+    def title(self, i):
+        return self.buffer[self.offsets[i]:self.offsets[i + 1]].tobytes().decode("utf-8")
+
+    def publisher(self, i):
+        return self.publishers[self.publisher_codes[i]]
+
+    def row(self, i):
+        '''
+        Row `i` as a dict in the dataset's JSON schema.
+        '''
+        row = {"original_index": int(self.original_index[i])}
+        for task in TASKS:
+            code = self.labels[task][i]
+            if code >= 0:
+                row[GOLD_KEYS[task]] = LABELS[task][code]
+        row["Title"] = self.title(i)
+        row["Publisher Title"] = self.publisher(i)
+        return row
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self.row(i)
+
+    def mask(self, publisher=None, **labels):
+        '''
+        Boolean row mask, e.g. `store.mask(publisher="road.cc", accident="Yes")`. Each filter takes a
+        single value or a collection of values.
+        '''
+        keep = np.ones(len(self), dtype=bool)
+        if publisher is not None:
+            names = [publisher] if isinstance(publisher, str) else publisher
+            codes = [self._publisher_lookup[p] for p in names if p in self._publisher_lookup]
+            keep &= np.isin(self.publisher_codes, codes)
+        for task, value in labels.items():
+            values = [value] if isinstance(value, str) else value
+            keep &= np.isin(self.labels[task], [LABELS[task].index(v) for v in values])
+        return keep
+
+    def where(self, publisher=None, **labels):
+        return np.flatnonzero(self.mask(publisher, **labels))
+
+    def take(self, indices):
+        '''
+        A new store holding only the rows at `indices`. The headline bytes are gathered in one array operation.
+        '''
+        indices = np.asarray(indices, dtype=np.int64)
+        starts = self.offsets[indices]
+        lengths = self.offsets[indices + 1] - starts
+        offsets = np.zeros(len(indices) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        positions = np.repeat(starts - offsets[:-1], lengths) + np.arange(offsets[-1], dtype=np.int64)
+        return HeadlineStore(
+            self.original_index[indices],
+            self.buffer[positions],
+            offsets,
+            self.publisher_codes[indices],
+            self.publishers,
+            {task: codes[indices] for task, codes in self.labels.items()},
+        )
+
+    def filter(self, publisher=None, **labels):
+        return self.take(self.where(publisher, **labels))
+
+    def publisher_counts(self):
+        counts = np.bincount(self.publisher_codes, minlength=len(self.publishers))
+        return {self.publishers[i]: int(counts[i]) for i in np.argsort(-counts, kind="stable") if counts[i]}
+
+    @property
+    def nbytes(self):
+        '''
+        Bytes held by the column arrays (publisher names are shared and not counted).
+        '''
+        arrays = [self.original_index, self.buffer, self.offsets, self.publisher_codes, *self.labels.values()]
+        return sum(a.nbytes for a in arrays)
@@ -0,0 +1,168 @@
+import json
+import time
+import bisect
+import cProfile
+import pstats
+from contextlib import contextmanager
+
+# Upper bounds in seconds; wide enough for microsecond prompt building and multi-second generations.
+LATENCY_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+METRIC_PREFIX = "bikeframe"
+# Stages timed by BatchRunner. `request` is the whole model call; streamed calls also split it
+# into `first_token` (time to first token) and `generation` (first token to parsed answer).
+STAGES = ("prompt", "request", "first_token", "generation", "parse")
+COUNTERS = ("rows", "errors", "retries", "cache_hits", "fast_path", "prompt_tokens", "completion_tokens")
+
+
+class Histogram:
+    '''
+    Fixed-bucket latency histogram (cumulative on export, like a Prometheus histogram).
+    '''
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # the last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q):
+        '''
+        Estimate the q-quantile by linear interpolation inside its bucket. The bucket holding the
+        largest observation ends at that observation, so estimates never exceed the observed max.
+        '''
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if n and seen + n >= rank:
+                lower = self.buckets[i - 1] if i else 0.0
+                upper = min(self.buckets[i], self.max) if i < len(self.buckets) else self.max
+                return min(lower + (upper - lower) * (rank - seen) / n, self.max)
+            seen += n
+        return self.max
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "mean": self.sum / self.count if self.count else None,
+            "p50": self.quantile(0.5),
+            "p90": self.quantile(0.9),
+            "p99": self.quantile(0.99),
+            "max": self.max if self.count else None,
+        }
+
+
+class Metrics:
+    '''
+    Per-stage latency histograms and run counters for BatchRunner (`BatchRunner(metrics=Metrics())`).
+    Export with `summary()` / `write_json()` or `prometheus()` / `write_prometheus()`.
+    '''
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.histograms = {stage: Histogram(buckets) for stage in STAGES}
+        self.counters = dict.fromkeys(COUNTERS, 0)
+        self.started = None
+        self.finished = None
+
+    def observe(self, stage, seconds):
+        if stage not in self.histograms:
+            self.histograms[stage] = Histogram(self.buckets)
+        self.histograms[stage].observe(seconds)
+
+    def increment(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    @contextmanager
+    def timer(self, stage):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+
+    def row_started(self):
+        if self.started is None:
+            self.started = time.perf_counter()
+
+    def row_finished(self, result):
+        self.finished = time.perf_counter()
+        self.counters["rows"] += 1
+        self.counters["errors"] += "error" in result
+        self.counters["fast_path"] += bool(result.get("fast_path"))
+        self.counters["cache_hits"] += bool(result.get("cached"))
+
+    def record_usage(self, usage):
+        if usage is not None:
+            self.counters["prompt_tokens"] += usage[0]
+            self.counters["completion_tokens"] += usage[1]
+
+    @property
+    def elapsed(self):
+        if self.started is None or self.finished is None:
+            return 0.0
+        return self.finished - self.started
+
+    @property
+    def rows_per_second(self):
+        return self.counters["rows"] / self.elapsed if self.elapsed else 0.0
+
+    def summary(self):
+        return {
+            "elapsed_seconds": self.elapsed,
+            "rows_per_second": self.rows_per_second,
+            "counters": dict(self.counters),
+            "latency_seconds": {stage: h.summary() for stage, h in self.histograms.items() if h.count},
+        }
+
+    def write_json(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.summary(), f, indent=2)
+
+    def prometheus(self):
+        '''
+        The metrics in the Prometheus text exposition format.
+        '''
+        name = f"{METRIC_PREFIX}_stage_seconds"
+        lines = [f"# HELP {name} Latency of each stage of a classification call.", f"# TYPE {name} histogram"]
+        for stage, h in self.histograms.items():
+            cumulative = 0
+            for bound, n in zip(self.buckets + ("+Inf",), h.counts):
+                cumulative += n
+                lines.append(f'{name}_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+            lines.append(f'{name}_sum{{stage="{stage}"}} {h.sum}')
+            lines.append(f'{name}_count{{stage="{stage}"}} {h.count}')
+        for counter, value in self.counters.items():
+            lines.append(f"# TYPE {METRIC_PREFIX}_{counter}_total counter")
+            lines.append(f"{METRIC_PREFIX}_{counter}_total {value}")
+        lines.append(f"# TYPE {METRIC_PREFIX}_rows_per_second gauge")
+        lines.append(f"{METRIC_PREFIX}_rows_per_second {self.rows_per_second}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(self.prometheus())
+
+
+@contextmanager
+def profiled(path=None, top=25, sort="cumulative", stream=None):
+    '''
+    Run the block under cProfile. Stats are dumped to `path` (for snakeviz / pstats) when given,
+    and the `top` entries are printed to `stream` when given.
+    '''
+    profile = cProfile.Profile()
+    profile.enable()
+    try:
+        yield profile
+    finally:
+        profile.disable()
+        if path is not None:
+            profile.dump_stats(path)
+        if stream is not None:
+            pstats.Stats(profile, stream=stream).sort_stats(sort).print_stats(top)
@@ -0,0 +1,341 @@
+'''
+Local stand-in for an OpenAI-compatible chat-completions endpoint.
+
+    python mock_server.py --port 8000 --latency 0.3 --tokens-per-second 80 --rate-limit 0.02
+    python cli.py run --base-url http://127.0.0.1:8000/v1 --out results/mock.jsonl
+
+Responses are replayed, in order of preference, from the response cache (exact request match), the
+built-in few-shot answers (when the headline is one of the examples), or one of the request's own
+few-shot answers (trace or JSON) chosen deterministically from the headline. Latency, streaming speed and 429/5xx error rates are simulated
+from a seed, so a run is reproducible: the same request gets the same fate on the same attempt.
+'''
+import re
+import json
+import math
+import time
+import zlib
+import random
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from bike_frame import FEW_SHOT_EXAMPLES, PROMPT_PROFILES
+from response_cache import cache_key
+from structured_output import STRUCTURED_TEMPLATES
+from trace_parser import LABELS
+
+CHAT_COMPLETIONS_PATHS = ("/v1/chat/completions", "/chat/completions")
+# Request fields that are not sampling parameters, so they are left out of the cache key.
+TRANSPORT_FIELDS = ("model", "messages", "stream", "stream_options", "n")
+CHARS_PER_TOKEN = 4  # for usage estimates
+MOCK_TOKEN_PATTERN = re.compile(r"\s*\w+|\s*[^\w\s]|\s+")
+LABEL_ALTERNATIVES = {label: labels for labels in LABELS.values() for label in labels}
+
+
+TEMPLATES = (*PROMPT_PROFILES.values(), *STRUCTURED_TEMPLATES.values())
+
+
+def few_shot_answers(templates=TEMPLATES):
+    '''
+    {user turn content: assistant answer} for the examples of every prompt template.
+    '''
+    answers = {}
+    for template in templates:
+        for message, reply in zip(template.prefix[1::2], template.prefix[2::2]):
+            answers[message["content"]] = reply["content"]
+    return answers
+
+
+def template_answers(templates=TEMPLATES):
+    '''
+    {first example answer: all example answers} per template, to answer unknown headlines in the
+    output format the request's own examples use.
+    '''
+    return {template.prefix[2]["content"]: [m["content"] for m in template.prefix[2::2]]
+            for template in templates if len(template.prefix) > 2}
+
+
+def split_tokens(text, tokens_per_chunk):
+    '''
+    Split a response into streaming chunks of roughly `tokens_per_chunk` words each.
+    '''
+    words = text.split(" ")
+    return [" ".join(words[i:i + tokens_per_chunk]) + (" " if i + tokens_per_chunk < len(words) else "")
+            for i in range(0, len(words), tokens_per_chunk)]
+
+
+class MockBackend:
+    '''
+    Chooses the response and the simulated behaviour (delay, speed, injected error) for each request.
+    '''
+    def __init__(self, cache_path=None, latency=0.0, jitter=0.0, tokens_per_second=None, tokens_per_chunk=4,
+                 rate_limit=0.0, error_rate=0.0, retry_after=1.0, seed=0):
+        self.cache_path = cache_path
+        self.latency = latency
+        self.jitter = jitter
+        self.tokens_per_second = tokens_per_second
+        self.tokens_per_chunk = tokens_per_chunk
+        self.rate_limit = rate_limit
+        self.error_rate = error_rate
+        self.retry_after = retry_after
+        self.seed = seed
+        self.answers = few_shot_answers()
+        self.fallbacks = template_answers()
+        self.attempts = {}
+        self.counts = {"requests": 0, "cache": 0, "few_shot": 0, "fallback": 0, "429": 0, "5xx": 0}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def cache(self):
+        # sqlite3 connections are bound to their thread, so each handler thread opens its own.
+        if self.cache_path is None:
+            return None
+        if getattr(self._local, "cache", None) is None:
+            from response_cache import ResponseCache
+
+            self._local.cache = ResponseCache(self.cache_path, read_only=True)
+        return self._local.cache
+
+    def count(self, key):
+        with self._lock:
+            self.counts[key] += 1
+
+    def fate(self, body):
+        '''
+        A random generator for this request that depends only on the seed, the request and how many
+        times it has been sent before, so retries can succeed and reruns behave the same.
+        '''
+        digest = zlib.crc32(json.dumps(body, sort_keys=True).encode("utf-8"))
+        with self._lock:
+            attempt = self.attempts.get(digest, 0)
+            self.attempts[digest] = attempt + 1
+            self.counts["requests"] += 1
+        return random.Random(f"{self.seed}:{digest}:{attempt}")
+
+    def injected_error(self, rng):
+        '''
+        (status, headers) of a simulated failure, or None.
+        '''
+        draw = rng.random()
+        if draw < self.rate_limit:
+            self.count("429")
+            return 429, {"retry-after-ms": str(int(self.retry_after * 1000))}
+        if draw < self.rate_limit + self.error_rate:
+            self.count("5xx")
+            return rng.choice((500, 502, 503)), {}
+        return None
+
+    def delay(self, rng):
+        return max(self.latency + rng.uniform(-self.jitter, self.jitter), 0.0)
+
+    def reply(self, body):
+        messages = body.get("messages") or []
+        params = {key: value for key, value in body.items() if key not in TRANSPORT_FIELDS}
+        cache = self.cache()
+        if cache is not None:
+            cached = cache.get(cache_key(body.get("model"), messages, params))
+            if cached is not None:
+                self.count("cache")
+                return cached
+        user = messages[-1]["content"] if messages else ""
+        if user in self.answers:
+            self.count("few_shot")
+            return self.answers[user]
+        self.count("fallback")
+        first_answer = messages[2]["content"] if len(messages) > 2 else ""
+        fallbacks = self.fallbacks.get(first_answer) or [answer for _, _, answer in FEW_SHOT_EXAMPLES]
+        return fallbacks[zlib.crc32(user.encode("utf-8")) % len(fallbacks)]
+
+
+def mock_logprobs(text, rng, top_logprobs=0):
+    '''
+    Simulated `logprobs.content` for `text`: near-certain ordinary tokens, and label tokens whose
+    alternatives are the other labels of the same task with the remaining probability.
+    '''
+    content = []
+    for token in MOCK_TOKEN_PATTERN.findall(text):
+        word = token.strip()
+        if word in LABEL_ALTERNATIVES:
+            chosen = rng.uniform(0.5, 0.999)
+            others = [label for label in LABEL_ALTERNATIVES[word] if label != word]
+            shares = [rng.random() + 1e-3 for _ in others]
+            top = [(token, chosen)] + [(token.replace(word, other), (1 - chosen) * share / sum(shares))
+                                       for other, share in zip(others, shares)]
+        else:
+            top = [(token, rng.uniform(0.9, 1.0))]
+        top = [{"token": t, "logprob": math.log(p), "bytes": list(t.encode("utf-8"))} for t, p in top[:max(top_logprobs, 1)]]
+        content.append(dict(top[0], top_logprobs=top if top_logprobs else []))
+    return {"content": content}
+
+
+def usage(messages, text, n=1):
+    prompt_tokens = sum(len(m.get("content") or "") for m in messages) // CHARS_PER_TOKEN
+    completion_tokens = n * (len(text) // CHARS_PER_TOKEN)
+    return {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens}
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    backend = None  # set by make_server
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, status, payload, headers=None):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def write_chunk(self, data):
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def do_GET(self):
+        if self.path.rstrip("/") in ("/v1/models", "/models"):
+            self.send_json(200, {"object": "list", "data": [{"id": "mock", "object": "model"}]})
+        else:
+            self.send_json(404, {"error": {"message": f"unknown path {self.path}"}})
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        if self.path not in CHAT_COMPLETIONS_PATHS:
+            self.send_json(404, {"error": {"message": f"unknown path {self.path}"}})
+            return
+        backend = self.backend
+        rng = backend.fate(body)
+        time.sleep(backend.delay(rng))
+        error = backend.injected_error(rng)
+        if error is not None:
+            status, headers = error
+            kind = "rate_limit_exceeded" if status == 429 else "server_error"
+            self.send_json(status, {"error": {"message": "simulated failure", "type": kind, "code": kind}}, headers)
+            return
+
+        text = backend.reply(body)
+        model = body.get("model", "mock")
+        created = int(time.time())
+        completion_id = f"chatcmpl-mock{rng.getrandbits(32):08x}"
+        try:
+            if body.get("stream"):
+                self.stream(body, text, model, created, completion_id)
+                return
+            n = body.get("n") or 1
+            if backend.tokens_per_second:
+                time.sleep(len(text.split(" ")) / backend.tokens_per_second)
+            choices = [{"index": i, "finish_reason": "stop", "message": {"role": "assistant", "content": text}}
+                       for i in range(n)]
+            if body.get("logprobs"):
+                for choice in choices:
+                    choice["logprobs"] = mock_logprobs(text, rng, body.get("top_logprobs") or 0)
+            self.send_json(200, {
+                "id": completion_id, "object": "chat.completion", "created": created, "model": model,
+                "choices": choices, "usage": usage(body.get("messages") or [], text, n),
+            })
+        except (BrokenPipeError, ConnectionResetError):
+            # The client stopped reading, e.g. after parsing the final answer from a stream.
+            self.close_connection = True
+
+    def stream(self, body, text, model, created, completion_id):
+        backend = self.backend
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def event(delta, finish_reason=None):
+            chunk = {"id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                     "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]}
+            self.write_chunk(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+
+        event({"role": "assistant", "content": ""})
+        for piece in split_tokens(text, backend.tokens_per_chunk):
+            if backend.tokens_per_second:
+                time.sleep(backend.tokens_per_chunk / backend.tokens_per_second)
+            event({"content": piece})
+        event({}, "stop")
+        if (body.get("stream_options") or {}).get("include_usage"):
+            chunk = {"id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                     "choices": [], "usage": usage(body.get("messages") or [], text)}
+            self.write_chunk(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+        self.write_chunk(b"data: [DONE]\n\n")
+        self.write_chunk(b"")
+
+
+def make_server(host="127.0.0.1", port=0, **backend_options):
+    handler = type("BoundMockHandler", (MockHandler,), {"backend": MockBackend(**backend_options)})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+class MockServer:
+    '''
+    Runs the mock endpoint on a background thread: `with MockServer(latency=0.2) as server:` then
+    point a client at `server.base_url`. Port 0 picks a free port.
+    '''
+    def __init__(self, host="127.0.0.1", port=0, **backend_options):
+        self.server = make_server(host, port, **backend_options)
+        self.thread = None
+
+    @property
+    def backend(self):
+        return self.server.RequestHandlerClass.backend
+
+    @property
+    def base_url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--cache", default=None, help="response cache to replay recorded responses from")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds before the first byte")
+    parser.add_argument("--jitter", type=float, default=0.0, help="uniform +/- jitter on the latency")
+    parser.add_argument("--tokens-per-second", type=float, default=None, help="generation speed (default: instant)")
+    parser.add_argument("--tokens-per-chunk", type=int, default=4)
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="fraction of requests answered with 429")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with 5xx")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="retry-after hint sent with 429s, seconds")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    server = make_server(args.host, args.port, cache_path=args.cache, latency=args.latency, jitter=args.jitter,
+                         tokens_per_second=args.tokens_per_second, tokens_per_chunk=args.tokens_per_chunk,
+                         rate_limit=args.rate_limit, error_rate=args.error_rate, retry_after=args.retry_after,
+                         seed=args.seed)
+    print(f"serving on http://{args.host}:{server.server_address[1]}/v1", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+import asyncio
+
+from checkpoint import ResultsJournal
+from dataset import load_dataset
+
+_DONE = object()
+
+
+def field_equals(**fields):
+    '''
+    Row filter keeping rows whose fields equal the given values, e.g. `field_equals(country="US")`.
+    '''
+    def keep(row):
+        return all(row.get(key) == value for key, value in fields.items())
+    return keep
+
+
+async def run_pipeline(source, results_path, runner, where=None, queue_size=None, fsync_every=100):
+    '''
+    Stream a JSONL (optionally gzipped) corpus, or any iterable of rows, through
+    read -> filter -> prompt/call/parse -> write. Stages are joined by bounded queues, so memory stays
+    flat however large the input is, and results are appended to `results_path` while the rest of the
+    input is still being read. Rows already in `results_path` are skipped, so an interrupted run
+    resumes where it stopped.
+    Returns:
+        dict: rows read, filtered out, skipped as already done, written and failed.
+    '''
+    if runner.client is None:
+        from batch_runner import make_client
+
+        runner.client = make_client()
+    queue_size = queue_size or 4 * runner.concurrency
+    pending = asyncio.Queue(maxsize=queue_size)
+    finished = asyncio.Queue(maxsize=queue_size)
+    stats = {"read": 0, "filtered": 0, "skipped": 0}
+
+    with ResultsJournal(results_path, fsync_every) as journal:
+        async def read():
+            for row in load_dataset(source) if isinstance(source, str) else source:
+                stats["read"] += 1
+                if where is not None and not where(row):
+                    stats["filtered"] += 1
+                elif row.get("original_index") in journal.completed:
+                    stats["skipped"] += 1
+                else:
+                    await pending.put(row)
+            for _ in range(runner.concurrency):
+                await pending.put(_DONE)
+
+        async def call():
+            while True:
+                row = await pending.get()
+                if row is _DONE:
+                    await finished.put(_DONE)
+                    return
+                await finished.put(await runner.process_row(row))
+
+        async def write():
+            remaining = runner.concurrency
+            while remaining:
+                result = await finished.get()
+                if result is _DONE:
+                    remaining -= 1
+                else:
+                    journal.record(result)
+
+        await asyncio.gather(read(), write(), *(call() for _ in range(runner.concurrency)))
+        stats.update(written=journal.written, failed=journal.failed)
+    return stats
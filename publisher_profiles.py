@@ -0,0 +1,166 @@
+import os
+import re
+import json
+
+from bike_frame import FEW_SHOT_EXAMPLES, PromptTemplate, headline_fields
+
+DEFAULT_PROFILE_PATH = "data/publisher_profiles.json"
+COVERAGE_PREFIX = "News Coverage Analysis Result:"
+MISSING_PROFILE = "No prior coverage profile is available for this news agency."
+# Completion cap for one coverage profile (two or three sentences).
+PROFILE_MAX_TOKENS = 200
+PROFILE_MAX_SENTENCES = 3
+# A headline trace instead of a coverage paragraph, e.g. a replayed or confused answer.
+TRACE_MARKERS = ("Final answer:", "Starting analysis")
+SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+COVERAGE_USER_TEMPLATE = """\
+```python
+input_text =  "{title}"
+publisher_title =  "{publisher_title}"
+news_coverage =  "{news_coverage}"
+bike_frame = BikeFrame(input_text, publisher_title)
+bike_frame.analyze_news_coverage = lambda prompt: news_coverage  # precomputed once per news agency
+final_answer = bike_frame.analyze_headline()
+print("Final answer:"+ final_answer)
+```
+
+# Instruction:
+Generate the expected execution output (output from all print() functions) of the code.
+You don't have to actually run the code and do not care about 'not implemented error'.
+The news coverage analysis is precomputed: print it as "News Coverage Analysis Result: news_coverage" instead of repeating its text.
+"""
+
+
+def coverage_prompt(publisher_title):
+    # Same question the BikeFrame pseudocode asks in assess_cyclist_perception(), Step 3.
+    return (
+        f"How does the news agency '{publisher_title}' typically cover stories related to cyclists, "
+        f"considering both past and present editorial stances? Assess the tone, language, "
+        f"and common themes in their reporting to discern any potential biases or recurring patterns. "
+        f"Answer in two or three sentences."
+    )
+
+
+def split_coverage(answer):
+    '''
+    Split a BikeFrame trace into (lines before, coverage paragraph, lines after) around the
+    "News Coverage Analysis Result:" line. The paragraph is None when the line is absent.
+    '''
+    lines = answer.split("\n")
+    for i, line in enumerate(lines):
+        if line.startswith(COVERAGE_PREFIX):
+            return lines[:i], line[len(COVERAGE_PREFIX):].strip(), lines[i + 1:]
+    return lines, None, []
+
+
+def seed_profiles(examples=FEW_SHOT_EXAMPLES):
+    '''
+    Coverage profiles already written out in the few-shot answers, keyed by publisher title.
+    '''
+    profiles = {}
+    for _, publisher_title, answer in examples:
+        _, coverage, _ = split_coverage(answer)
+        if coverage:
+            profiles[publisher_title] = coverage
+    return profiles
+
+
+class ProfileStore:
+    '''
+    JSON file mapping each publisher title to its news-coverage profile.
+    '''
+    def __init__(self, path=DEFAULT_PROFILE_PATH):
+        self.path = path
+        self.profiles = {}
+        if path and os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                self.profiles = json.load(f)
+        for publisher_title, coverage in seed_profiles().items():
+            self.profiles.setdefault(publisher_title, coverage)
+
+    def __contains__(self, publisher_title):
+        return publisher_title in self.profiles
+
+    def get(self, publisher_title, default=None):
+        return self.profiles.get(publisher_title, default)
+
+    def missing(self, publisher_titles):
+        '''
+        Distinct publisher titles without a stored profile, in first-seen order.
+        '''
+        return [p for p in dict.fromkeys(publisher_titles) if p and p not in self.profiles]
+
+    def save(self):
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump(self.profiles, f, ensure_ascii=False, indent=1, sort_keys=True)
+
+
+def clean_profile(text):
+    '''
+    A model answer as a stored profile: whitespace collapsed and cut to PROFILE_MAX_SENTENCES
+    sentences, or None when it is empty or looks like a headline trace.
+    '''
+    text = " ".join((text or "").split())
+    if not text or any(marker in text for marker in TRACE_MARKERS):
+        return None
+    return " ".join(SENTENCE_END.split(text)[:PROFILE_MAX_SENTENCES])
+
+
+def profile_messages(row):
+    return [{"role": "user", "content": coverage_prompt(row["ptitle"])}]
+
+
+async def build_profiles(rows, store, runner):
+    '''
+    Generate one coverage profile for every publisher in `rows` that the store lacks, using a
+    BatchRunner for the calls. The cost scales with the number of distinct publishers, not headlines.
+    Only the connection settings and temperature of `runner` are reused: its other sampling parameters
+    (e.g. a structured output's completion cap or response_format) belong to the headline prompt.
+    Answers that are not a coverage paragraph are not stored (see clean_profile).
+    Returns:
+        list: the results for publishers that could not be profiled.
+    '''
+    from batch_runner import BatchRunner
+
+    publishers = store.missing(headline_fields(row)[1] for row in rows)
+    params = {"max_tokens": PROFILE_MAX_TOKENS}
+    if "temperature" in runner.params:
+        params["temperature"] = runner.params["temperature"]
+    profile_runner = BatchRunner(
+        client=runner.client, model=runner.model, concurrency=runner.concurrency,
+        max_retries=runner.max_retries, prompt=profile_messages, cache=runner.cache, parser=clean_profile, **params,
+    )
+    results = await profile_runner.run([{"original_index": p, "ptitle": p} for p in publishers])
+    failed = []
+    for result in results:
+        if result.get("labels"):
+            store.profiles[result["original_index"]] = result["labels"]
+        else:
+            result.setdefault("error", "response is not a coverage profile")
+            failed.append(result)
+    store.save()
+    return failed
+
+
+class CoveragePromptTemplate(PromptTemplate):
+    '''
+    Prompt variant that injects a stored per-publisher coverage profile into the user turn, so the
+    model prints a placeholder instead of writing the coverage paragraph for every headline.
+    '''
+    def __init__(self, store, examples=FEW_SHOT_EXAMPLES, user_template=COVERAGE_USER_TEMPLATE, **kwargs):
+        self.store = store
+        super().__init__(examples=examples, user_template=user_template, **kwargs)
+
+    def format_user(self, title, publisher_title):
+        news_coverage = self.store.get(publisher_title, MISSING_PROFILE).replace('"', "'")
+        return self.user_template.format(title=title, publisher_title=publisher_title, news_coverage=news_coverage)
+
+    def example_messages(self, example):
+        title, publisher_title, answer = example
+        before, coverage, after = split_coverage(answer)
+        if coverage is not None:
+            answer = "\n".join(before + [f"{COVERAGE_PREFIX} news_coverage"] + after)
+        return super().example_messages((title, publisher_title, answer))
@@ -0,0 +1,121 @@
+import os
+import json
+import hashlib
+import sqlite3
+
+DEFAULT_CACHE_PATH = "cache/responses.sqlite"
+
+
+def cache_key(model, messages, params=None):
+    '''
+    Stable content hash of a chat-completion request: model name, sampling parameters and the full message list.
+    '''
+    payload = json.dumps(
+        {"model": model, "params": params or {}, "messages": messages},
+        sort_keys=True, ensure_ascii=False, separators=(",", ":"),
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    '''
+    On-disk SQLite cache of model responses keyed by `cache_key`. Entries are evicted least recently
+    used first once the stored responses exceed `max_bytes`. In read-only mode the cache is never
+    written, not even to record access order.
+    '''
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_bytes=512 * 2**20, read_only=False):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.read_only = read_only
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        if read_only:
+            self.conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, isolation_level=None)
+        else:
+            if os.path.dirname(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+            self.conn = sqlite3.connect(path, isolation_level=None)
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, response TEXT NOT NULL, size INTEGER NOT NULL, last_access INTEGER NOT NULL)"
+            )
+            self.conn.execute("CREATE INDEX IF NOT EXISTS responses_last_access ON responses(last_access)")
+
+        total, clock = self.conn.execute("SELECT COALESCE(SUM(size), 0), COALESCE(MAX(last_access), 0) FROM responses").fetchone()
+        self.total_bytes = total
+        self._clock = clock  # monotonically increasing access counter used for LRU order
+
+    def _tick(self):
+        self._clock += 1
+        return self._clock
+
+    def get(self, key):
+        row = self.conn.execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        if not self.read_only:
+            self.conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (self._tick(), key))
+        return row[0]
+
+    def put(self, key, response):
+        if self.read_only:
+            return
+        size = len(response.encode("utf-8"))
+        old = self.conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+        self.conn.execute(
+            "INSERT OR REPLACE INTO responses (key, response, size, last_access) VALUES (?, ?, ?, ?)",
+            (key, response, size, self._tick()),
+        )
+        self.total_bytes += size - (old[0] if old else 0)
+        if self.total_bytes > self.max_bytes:
+            self.evict()
+
+    def evict(self):
+        '''
+        Drop least recently used entries until the cache fits in `max_bytes`.
+        '''
+        cursor = self.conn.execute("SELECT key, size FROM responses ORDER BY last_access")
+        stale = []
+        for key, size in cursor:
+            if self.total_bytes <= self.max_bytes:
+                break
+            stale.append((key,))
+            self.total_bytes -= size
+        cursor.close()
+        self.conn.executemany("DELETE FROM responses WHERE key = ?", stale)
+        self.evictions += len(stale)
+
+    def __contains__(self, key):
+        '''
+        Whether `key` is cached, without counting a lookup or touching its access order.
+        '''
+        return self.conn.execute("SELECT 1 FROM responses WHERE key = ?", (key,)).fetchone() is not None
+
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self),
+            "bytes": self.total_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+        }
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
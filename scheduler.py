@@ -0,0 +1,290 @@
+import time
+import asyncio
+import bisect
+import random
+from itertools import count
+from email.utils import parsedate_to_datetime
+
+from batch_runner import BatchRunner, make_client
+from response_cache import cache_key
+
+DEFAULT_TOKENS_PER_MINUTE = 200_000
+
+
+def is_rate_limited(error):
+    '''
+    True for HTTP 429 errors, whether raised by the openai SDK or by any client exposing a status code.
+    '''
+    if type(error).__name__ == "RateLimitError":
+        return True
+    status = getattr(error, "status_code", None) or getattr(error, "status", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    return status == 429
+
+
+def retry_after(error):
+    '''
+    Seconds the server asked us to wait (`retry-after-ms` or `retry-after`, in seconds or as an HTTP date),
+    or None when the error carries no hint.
+    '''
+    headers = getattr(getattr(error, "response", None), "headers", None) or getattr(error, "headers", None) or {}
+    value = headers.get("retry-after-ms")
+    if value:
+        try:
+            return float(value) / 1000
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    '''
+    Tokens-per-minute budget refilled continuously up to `capacity` (one minute of quota by default).
+    `pause()` empties the bucket and stops refilling until a server-requested retry time has passed.
+    '''
+    def __init__(self, tokens_per_minute=DEFAULT_TOKENS_PER_MINUTE, capacity=None):
+        self.rate = tokens_per_minute / 60
+        self.capacity = capacity if capacity is not None else tokens_per_minute
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+
+    def refill(self):
+        now = time.monotonic()
+        if now > self.updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+        return self.tokens
+
+    def wait_time(self, n):
+        '''
+        Seconds until `n` tokens (capped at capacity) are available.
+        '''
+        self.refill()
+        paused = max(self.updated - time.monotonic(), 0.0)
+        return paused + max(min(n, self.capacity) - self.tokens, 0.0) / self.rate
+
+    def take(self, n):
+        self.tokens -= min(n, self.capacity)
+
+    async def acquire(self, n):
+        while (wait := self.wait_time(n)) > 0:
+            await asyncio.sleep(wait)
+        self.take(n)
+
+    def pause(self, seconds):
+        self.refill()
+        self.tokens = 0.0
+        self.updated = max(self.updated, time.monotonic() + seconds)
+
+
+class AIMDLimiter:
+    '''
+    Concurrency limit that grows by `increase` per window of successful calls and is multiplied by
+    `decrease` on a rate-limit response (at most once per `cooldown` seconds, so one burst of 429s
+    only halves it once).
+    '''
+    def __init__(self, initial=4, minimum=1, maximum=64, increase=1.0, decrease=0.5, cooldown=1.0):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.increase = increase
+        self.decrease = decrease
+        self.cooldown = cooldown
+        self.in_flight = 0
+        self.peak = 0
+        self.decreases = 0
+        self.last_decrease = float("-inf")
+        self._condition = None
+
+    @property
+    def condition(self):
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+        return self._condition
+
+    async def acquire(self):
+        async with self.condition:
+            await self.condition.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+            self.peak = max(self.peak, self.in_flight)
+
+    async def release(self):
+        async with self.condition:
+            self.in_flight -= 1
+            self.condition.notify_all()
+
+    def on_success(self):
+        # +increase per `limit` successes, i.e. roughly one step per round of in-flight requests.
+        self.limit = min(self.maximum, self.limit + self.increase / self.limit)
+
+    def on_rate_limit(self):
+        now = time.monotonic()
+        if now - self.last_decrease >= self.cooldown:
+            self.limit = max(self.minimum, self.limit * self.decrease)
+            self.last_decrease = now
+            self.decreases += 1
+
+
+class ScheduledRunner(BatchRunner):
+    '''
+    BatchRunner that paces requests to a tokens-per-minute quota. Each row's cost is estimated before
+    sending (prompt tokens from `token_counter` plus `max_tokens`, or the mean few-shot answer length)
+    and admitted through a TokenBucket; among the pending rows the largest one that fits the remaining
+    budget goes first, both for `run` and for the rows waiting in `process_row` (e.g. run_pipeline's
+    workers), where the candidates are the rows waiting at that moment. Without a `token_counter`, one is
+    built for the template behind `prompt`. Concurrency starts at `initial_concurrency` and adapts AIMD-style up to
+    `concurrency`, backing off on 429 responses and honouring their retry-after hints.
+    '''
+    def __init__(self, *args, tokens_per_minute=DEFAULT_TOKENS_PER_MINUTE, initial_concurrency=4, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.bucket = TokenBucket(tokens_per_minute)
+        self.limiter = AIMDLimiter(min(initial_concurrency, self.concurrency), maximum=self.concurrency)
+        self.rate_limited = 0
+        self.tokens_admitted = 0
+        self.waiting = []  # (cost, arrival) of rows in process_row not yet admitted, sorted
+        self._arrivals = count()
+
+    def output_tokens(self):
+        return int(self.params.get("max_tokens") or self.ensure_token_counter().example_output_tokens())
+
+    def request_cost(self, row):
+        output_tokens = self.output_tokens()
+        return min(self.ensure_token_counter().row_tokens(row) + output_tokens, self.bucket.capacity)
+
+    def request_costs(self, rows):
+        '''
+        request_cost of every row, with the prompts counted in bulk.
+        '''
+        output_tokens = self.output_tokens()
+        costs = self.ensure_token_counter().count_rows(rows) + output_tokens
+        return costs.clip(max=self.bucket.capacity).tolist()
+
+    def settled_locally(self, row):
+        '''
+        True when BatchRunner answers `row` without a request: fast path, cache hit or over the input
+        token cap. Such rows neither spend quota nor take a concurrency slot.
+        '''
+        if self.pre_classifier is not None and self.pre_classifier(row) is not None:
+            return True
+        if self.max_input_tokens is not None and self.ensure_token_counter().row_tokens(row) > self.max_input_tokens:
+            return True
+        return self.cache is not None and cache_key(self.model, self.prompt(row), self.params) in self.cache
+
+    async def process_row(self, row):
+        if self.settled_locally(row):
+            return await super().process_row(row)
+        cost = self.request_cost(row)
+        await self.limiter.acquire()
+        try:
+            await self.admit(cost)
+            return await super().process_row(row)
+        finally:
+            await self.limiter.release()
+
+    async def with_retries(self, make_call):
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = await make_call()
+                self.limiter.on_success()
+                return response
+            except Exception as e:
+                if attempt == self.max_retries:
+                    raise
+                if self.metrics is not None:
+                    self.metrics.increment("retries")
+                delay = min(2 ** attempt, 30) * (0.5 + random.random())
+                if is_rate_limited(e):
+                    self.rate_limited += 1
+                    self.limiter.on_rate_limit()
+                    hint = retry_after(e)
+                    if hint is not None:
+                        delay = hint
+                    # The quota estimate was optimistic: hold every new request until the server is ready.
+                    self.bucket.pause(delay)
+                await asyncio.sleep(delay)
+
+    def fitting(self, pending):
+        '''
+        Index of the largest (cost, key) in sorted `pending` that the bucket can pay for now, or None.
+        '''
+        i = bisect.bisect_right(pending, (self.bucket.refill(), float("inf"))) - 1
+        if i >= 0 and self.bucket.wait_time(pending[i][0]) == 0:
+            return i
+        return None
+
+    async def next_row(self, pending):
+        '''
+        Take the largest pending (cost, position) that fits the bucket, waiting for the smallest when none does.
+        '''
+        while True:
+            i = self.fitting(pending)
+            if i is not None:
+                cost, position = pending.pop(i)
+                self.bucket.take(cost)
+                self.tokens_admitted += cost
+                return position
+            await asyncio.sleep(max(self.bucket.wait_time(pending[0][0]), 0.001))
+
+    async def admit(self, cost):
+        '''
+        Wait until this row is the largest waiting row that fits the bucket, then pay for it.
+        '''
+        entry = (cost, next(self._arrivals))
+        bisect.insort(self.waiting, entry)
+        try:
+            while True:
+                i = self.fitting(self.waiting)
+                if i is not None and self.waiting[i] == entry:
+                    self.bucket.take(cost)
+                    self.tokens_admitted += cost
+                    return
+                # Another waiting row goes first; when none fits, sleep until the smallest could.
+                delay = 0 if i is not None else self.bucket.wait_time(self.waiting[0][0])
+                await asyncio.sleep(max(delay, 0.001))
+        finally:
+            self.waiting.remove(entry)
+
+    async def run(self, rows, on_result=None):
+        if self.client is None:
+            self.client = make_client()
+        rows = list(rows)
+        local = [position for position, row in enumerate(rows) if self.settled_locally(row)]
+        remote = sorted(set(range(len(rows))) - set(local))
+        pending = sorted(zip(self.request_costs(rows[position] for position in remote), remote))
+        results = [None] * len(rows)
+
+        async def worker(position, slot=True):
+            try:
+                results[position] = await BatchRunner.process_row(self, rows[position])
+            finally:
+                if slot:
+                    await self.limiter.release()
+            if on_result is not None:
+                on_result(results[position])
+
+        tasks = [asyncio.create_task(worker(position, slot=False)) for position in local]
+        while pending:
+            await self.limiter.acquire()
+            tasks.append(asyncio.create_task(worker(await self.next_row(pending))))
+        await asyncio.gather(*tasks)
+        return results
+
+    def stats(self):
+        return {
+            "concurrency_limit": self.limiter.limit,
+            "peak_concurrency": self.limiter.peak,
+            "rate_limited": self.rate_limited,
+            "concurrency_decreases": self.limiter.decreases,
+            "tokens_admitted": self.tokens_admitted,
+        }
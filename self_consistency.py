@@ -0,0 +1,94 @@
+import time
+from collections import Counter
+
+from batch_runner import BatchRunner, response_usage
+
+
+def choice_texts(response):
+    '''
+    The text of every choice in a chat-completion response (SDK object or plain dict).
+    '''
+    if isinstance(response, dict):
+        return [choice["message"]["content"] for choice in response["choices"]]
+    return [choice.message.content for choice in response.choices]
+
+
+def vote_margin(votes):
+    ranked = votes.most_common(2)
+    if not ranked:
+        return 0
+    return ranked[0][1] - (ranked[1][1] if len(ranked) > 1 else 0)
+
+
+class VotingRunner(BatchRunner):
+    '''
+    BatchRunner with adaptive self-consistency voting. Traces are sampled in rounds of `round_size`
+    completions, requested together with the `n` parameter where the endpoint supports it, until the
+    leading (accident, fault, perception) tuple is `margin` votes ahead of the runner-up or
+    `max_samples` have been drawn. Confident headlines stop after one round; only uncertain ones pay
+    for more samples. `stream` and `cache` are not supported: the response cache holds single traces.
+    '''
+    def __init__(self, *args, round_size=3, max_samples=9, margin=2, temperature=0.7, **kwargs):
+        super().__init__(*args, temperature=temperature, **kwargs)
+        if self.stream or self.cache is not None:
+            raise ValueError("VotingRunner supports neither stream nor cache")
+        self.round_size = round_size
+        self.max_samples = max_samples
+        self.margin = margin
+        self.samples_drawn = 0
+        self.rows_voted = 0
+        self.early_stops = 0
+
+    async def sample(self, messages, n):
+        start = time.perf_counter()
+        response = await self.with_retries(lambda: self.client.chat.completions.create(
+            model=self.model, messages=messages, n=n, **self.params))
+        if self.metrics is not None:
+            self.metrics.observe("request", time.perf_counter() - start)
+            self.metrics.record_usage(response_usage(response))
+        return [(text, self.parse(text)) for text in choice_texts(response)]
+
+    async def vote(self, messages):
+        '''
+        Returns:
+            tuple: (winning labels or None, Counter of label tuples, one trace per vote key, samples drawn)
+        '''
+        votes = Counter()
+        traces = {}
+        drawn = 0
+        while drawn < self.max_samples:
+            samples = await self.sample(messages, min(self.round_size, self.max_samples - drawn))
+            if not samples:
+                break
+            drawn += len(samples)
+            for text, labels in samples:
+                if labels is not None:
+                    votes[labels] += 1
+                    traces.setdefault(labels, text)
+            if vote_margin(votes) >= self.margin:
+                break
+        winner = votes.most_common(1)[0][0] if votes else None
+        return winner, votes, traces, drawn
+
+    async def call(self, messages, result):
+        try:
+            winner, votes, traces, drawn = await self.vote(messages)
+        except Exception as e:
+            result["error"] = f"{type(e).__name__}: {e}"
+            return
+        self.rows_voted += 1
+        self.samples_drawn += drawn
+        self.early_stops += drawn < self.max_samples
+        result["labels"] = winner
+        result["response"] = traces.get(winner, "")
+        result["votes"] = [[list(labels), count] for labels, count in votes.most_common()]
+        result["samples"] = drawn
+        result["agreement"] = votes[winner] / drawn if winner else 0.0
+
+    def stats(self):
+        return {
+            "rows": self.rows_voted,
+            "samples": self.samples_drawn,
+            "samples_per_row": self.samples_drawn / self.rows_voted if self.rows_voted else 0.0,
+            "early_stops": self.early_stops,
+        }
@@ -0,0 +1,148 @@
+import re
+import json
+
+from bike_frame import FEW_SHOT_EXAMPLES, LEAN_SYSTEM_MESSAGE, PromptTemplate
+from trace_parser import LABELS, TASKS, canonical_labels, final_labels, parse_trace
+
+STRUCTURED_USER_TEMPLATE = """\
+```python
+accident, fault, perception = BikeFrame("{title}", "{publisher_title}").analyze_headline()
+```
+Do not print the trace. Reply with only a JSON object with the keys {keys}.
+"""
+
+# Keys of the JSON answer at each verbosity, in the order the model writes them: the terse
+# chain-of-code steps first, the labels last.
+VERBOSITY_KEYS = {
+    "labels": ("accident", "fault", "perception"),
+    "brief": ("rationale", "accident", "fault", "perception"),
+    "steps": ("accident_reason", "parties", "fault_party", "coverage", "rationale", "accident", "fault", "perception"),
+}
+# Completion caps per verbosity, a little above the longest few-shot answer.
+MAX_TOKENS = {"labels": 32, "brief": 128, "steps": 384}
+PARTY_KEYS = ("party", "behavior", "violated_law", "tone")
+JSON_OBJECT = re.compile(r"\{.*\}", re.DOTALL)
+
+
+def first_sentence(text):
+    return text.split(". ")[0].rstrip(".") + "." if text else ""
+
+
+def conclusion(text):
+    '''
+    First and last sentences of an intermediate rationale: the reason and the perception it concludes.
+    '''
+    sentences = text.split(". ")
+    if len(sentences) == 1:
+        return text
+    return f"{sentences[0]}. {sentences[-1]}"
+
+
+def structured_answer(answer, verbosity="brief"):
+    '''
+    The JSON answer equivalent to a printed BikeFrame trace, built from the trace's own steps.
+    '''
+    trace = parse_trace(answer)
+    behaviors = next((r.value for r in trace.by_kind("party_behaviors") if isinstance(r.value, dict)), {})
+    laws = {r.value[0]: r.value[1] for r in trace.by_kind("law")}
+    tones = {r.value[0]: r.value[1] for r in trace.by_kind("tone")}
+    accident = trace.by_kind("accident")
+    fault_party = trace.by_kind("fault_party")
+    coverage = trace.by_kind("news_coverage")
+    rationale = trace.by_kind("rationale")
+    fields = {
+        "accident_reason": first_sentence(accident[0].value[1]) if accident else "",
+        "parties": [
+            {"party": party, "behavior": behavior, "violated_law": laws.get(party, False), "tone": tones.get(party, "")}
+            for party, behavior in behaviors.items()
+        ],
+        "fault_party": fault_party[0].text if fault_party else None,
+        "coverage": first_sentence(coverage[0].text) if coverage else "",
+        "rationale": conclusion(rationale[0].text) if rationale else "",
+    }
+    fields.update(zip(TASKS, trace.labels))
+    return json.dumps({key: fields[key] for key in VERBOSITY_KEYS[verbosity]}, ensure_ascii=False)
+
+
+def response_schema(verbosity="brief"):
+    '''
+    Strict JSON schema of the answer at `verbosity`.
+    '''
+    properties = {
+        "accident_reason": {"type": "string"},
+        "parties": {"type": "array", "items": {
+            "type": "object",
+            "properties": {"party": {"type": "string"}, "behavior": {"type": "string"},
+                           "violated_law": {"type": "boolean"}, "tone": {"type": "string"}},
+            "required": list(PARTY_KEYS),
+            "additionalProperties": False,
+        }},
+        "fault_party": {"type": ["string", "null"]},
+        "coverage": {"type": "string"},
+        "rationale": {"type": "string"},
+    }
+    properties.update({task: {"type": "string", "enum": list(LABELS[task])} for task in TASKS})
+    keys = VERBOSITY_KEYS[verbosity]
+    return {"type": "object", "properties": {key: properties[key] for key in keys}, "required": list(keys),
+            "additionalProperties": False}
+
+
+def response_format(verbosity="brief"):
+    '''
+    `response_format` request parameter enforcing the answer schema (OpenAI structured outputs).
+    '''
+    return {"type": "json_schema",
+            "json_schema": {"name": f"bikeframe_{verbosity}", "strict": True, "schema": response_schema(verbosity)}}
+
+
+def parse_structured(text):
+    '''
+    Labels from a JSON answer, tolerating code fences and surrounding text. Falls back to a printed
+    trace's final answer, so trace-mode responses still parse.
+    Returns:
+        tuple: (accident, fault, perception) in canonical case, or None.
+    '''
+    if not text:
+        return None
+    match = JSON_OBJECT.search(text)
+    if match:
+        try:
+            answer = json.loads(match.group(0))
+        except ValueError:
+            answer = None
+        if isinstance(answer, dict) and all(task in answer for task in TASKS):
+            return canonical_labels(answer[task] for task in TASKS)
+    return final_labels(text)
+
+
+class StructuredPromptTemplate(PromptTemplate):
+    '''
+    Few-shot prompt whose answers are compact JSON objects instead of printed traces. The examples
+    are the built-in traces converted by `structured_answer`, so both modes teach the same reasoning.
+    The printed-trace templates stay the reference for auditing.
+    '''
+    def __init__(self, verbosity="brief", system_message=LEAN_SYSTEM_MESSAGE, examples=FEW_SHOT_EXAMPLES,
+                 user_template=STRUCTURED_USER_TEMPLATE):
+        self.verbosity = verbosity
+        examples = [(title, publisher_title, structured_answer(answer, verbosity))
+                    for title, publisher_title, answer in examples]
+        keys = ", ".join(f'"{key}"' for key in VERBOSITY_KEYS[verbosity])
+        super().__init__(system_message, examples, user_template.replace("{keys}", keys))
+
+    def request_params(self, schema=True):
+        '''
+        Sampling parameters for this mode: the completion cap and, with `schema`, the strict response format.
+        '''
+        params = {"max_tokens": MAX_TOKENS[self.verbosity]}
+        if schema:
+            params["response_format"] = response_format(self.verbosity)
+        return params
+
+    def runner_options(self, schema=True):
+        '''
+        Keyword arguments for BatchRunner: `BatchRunner(**template.runner_options(), temperature=0)`.
+        '''
+        return {"prompt": self.render, "parser": parse_structured, **self.request_params(schema)}
+
+
+STRUCTURED_TEMPLATES = {verbosity: StructuredPromptTemplate(verbosity) for verbosity in VERBOSITY_KEYS}
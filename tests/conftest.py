@@ -0,0 +1,15 @@
+import os
+import sys
+
+# The modules live at the repository root, next to this directory.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class WhitespaceEncoding:
+    '''
+    Offline stand-in for a tiktoken encoding: one token per whitespace-separated word.
+    '''
+    name = "whitespace"
+
+    def encode_ordinary(self, text):
+        return text.split()
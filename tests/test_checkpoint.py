@@ -0,0 +1,57 @@
+import json
+
+import pytest
+
+from checkpoint import ResultsJournal, failed_path_for
+
+LABELS = ["No", "Unknown", "Neutral"]
+
+
+def write_lines(path, text):
+    path.write_text(text, encoding="utf-8")
+
+
+def result(index, **fields):
+    return json.dumps({"original_index": index, "labels": LABELS, **fields}) + "\n"
+
+
+def test_scan_truncates_only_a_torn_last_line(tmp_path):
+    path = tmp_path / "results.jsonl"
+    write_lines(path, result(1) + result(2) + '{"original_index": 3, "lab')
+    with ResultsJournal(str(path)) as journal:
+        assert journal.completed == {1, 2}
+    assert path.read_text(encoding="utf-8") == result(1) + result(2)
+
+
+def test_scan_keeps_results_after_an_unreadable_line(tmp_path):
+    path = tmp_path / "results.jsonl"
+    text = result(1) + "not json\n" + result(3)
+    write_lines(path, text)
+    with pytest.warns(UserWarning, match="1 unreadable"):
+        journal = ResultsJournal(str(path))
+    journal.close()
+    assert journal.completed == {1, 3}
+    assert path.read_text(encoding="utf-8") == text
+
+
+def test_failures_and_unparsed_results_are_retried(tmp_path):
+    path = tmp_path / "results.jsonl"
+    with ResultsJournal(str(path)) as journal:
+        journal.record({"original_index": 1, "labels": LABELS})
+        journal.record({"original_index": 2, "error": "timeout"})
+        journal.record({"original_index": 3, "response": "garbage", "labels": None})
+    with ResultsJournal(str(path)) as journal:
+        assert journal.completed == {1}
+        assert [row["original_index"] for row in journal.pending([{"original_index": i} for i in (1, 2, 3)])] == [2, 3]
+    failures = [json.loads(line) for line in open(failed_path_for(str(path)), encoding="utf-8")]
+    assert [f["original_index"] for f in failures] == [2, 3]
+    assert failures[1]["error"] == "response could not be parsed"
+
+
+def test_failed_file_is_appended_across_runs(tmp_path):
+    path = tmp_path / "results.jsonl"
+    for index in (1, 2):
+        with ResultsJournal(str(path)) as journal:
+            journal.record({"original_index": index, "error": "timeout"})
+    with open(failed_path_for(str(path)), encoding="utf-8") as f:
+        assert len(f.readlines()) == 2
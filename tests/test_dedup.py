@@ -0,0 +1,42 @@
+from dedup import Deduplicator, jaccard, normalize_title, shingles
+
+HEADLINE = "Cyclist seriously injured after crash with car on the A road near town"
+
+
+def rows(*pairs):
+    return [{"original_index": i, "Title": title, "Publisher Title": publisher}
+            for i, (title, publisher) in enumerate(pairs)]
+
+
+def test_normalize_title_strips_publisher_suffix_and_punctuation():
+    assert normalize_title("Cyclist hurt in crash! - BBC News", "BBC News") == "cyclist hurt in crash"
+
+
+def test_syndicated_copies_form_one_cluster():
+    data = rows((HEADLINE + " - Alpha", "Alpha"), ("Council votes on bike lanes", "Beta"), (HEADLINE + " - Gamma", "Gamma"))
+    assert Deduplicator().clusters(data) == [[0, 2], [1]]
+
+
+def test_by_publisher_merges_duplicates_within_each_publisher():
+    data = rows((HEADLINE, "Alpha"), (HEADLINE, "Beta"), (HEADLINE, "Beta"))
+    assert Deduplicator(by_publisher=True).clusters(data) == [[0], [1, 2]]
+    assert Deduplicator().clusters(data) == [[0, 1, 2]]
+
+
+def test_chains_of_similar_headlines_merge():
+    a = "the quick brown fox jumps over the lazy dog near the river bank today"
+    b = "the quick brown fox jumps over the lazy dog near the river bank yesterday"
+    c = "the quick brown fox jumps over the lazy dog near the river bend yesterday"
+    sets = [shingles(normalize_title(title)) for title in (a, b, c)]
+    threshold = 0.75
+    assert jaccard(sets[0], sets[1]) >= threshold and jaccard(sets[1], sets[2]) >= threshold
+    assert jaccard(sets[0], sets[2]) < threshold
+    data = rows((a, ""), (b, ""), (c, ""))
+    assert Deduplicator(threshold=threshold, bands=32).clusters(data) == [[0, 1, 2]]
+
+
+def test_report_counts_avoided_calls():
+    data = rows((HEADLINE, "Alpha"), (HEADLINE, "Beta"), ("Something else entirely", "Beta"))
+    report = Deduplicator().report(data)
+    assert report["clusters"] == 2
+    assert report["duplicates"] == 1
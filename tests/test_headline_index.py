@@ -0,0 +1,65 @@
+import pytest
+
+from headline_index import HeadlineIndex
+
+ROWS = [
+    {"original_index": 10, "Title": "Cyclist killed in hit-and-run - BBC News", "Publisher Title": "BBC News",
+     "accident_data": "Yes", "fault_data": "Other", "perception_annotation": "Negative"},
+    {"original_index": 11, "Title": "Hit and run driver jailed", "Publisher Title": "road.cc",
+     "accident_data": "Yes", "fault_data": "Other", "perception_annotation": "Neutral"},
+    {"original_index": 12, "Title": "Run to the shops, then hit the bike path", "Publisher Title": "Daily Mail",
+     "accident_data": "No", "fault_data": "Unknown", "perception_annotation": "Positive"},
+]
+
+
+@pytest.fixture
+def index():
+    index = HeadlineIndex()
+    index.add(ROWS)
+    return index
+
+
+@pytest.mark.parametrize("query, expected", [
+    ('"hit and run"', [10, 11]),
+    ("hit-and-run", [10, 11]),
+    ("hit run", [10, 11, 12]),
+    ('"hit and run" AND publisher-category:mainstream', [10]),
+    ('"hit and run" publisher-category:cycling', [11]),
+    ("jailed OR path", [11, 12]),
+    ("hit NOT accident:yes", [12]),
+    ('publisher:"bbc news"', [10]),
+    ("(jailed OR killed) AND NOT fault:cyclist", [10, 11]),
+    ("NOT NOT perception:positive", [12]),
+    ("unicycle", []),
+])
+def test_search(index, query, expected):
+    assert index.search(query) == expected
+
+
+@pytest.mark.parametrize("query", ["", "hit AND", "(hit", "hit )", "OR hit", "colour:red"])
+def test_malformed_queries_raise(index, query):
+    with pytest.raises(ValueError):
+        index.search(query)
+
+
+def test_add_is_incremental(index):
+    assert index.add(ROWS) == 0
+    assert index.add([{"original_index": 13, "Title": "Another hit and run", "Publisher Title": "Cyclist"}]) == 1
+    assert index.search('"hit and run"') == [10, 11, 13]
+
+
+def test_counts_join_predictions(index):
+    ids = index.search("hit")
+    assert index.counts(ids, by="publisher-category") == {"mainstream": {"Negative": 1, "Positive": 1},
+                                                          "cycling": {"Neutral": 1}}
+    predictions = {10: ("Yes", "Other", "Neutral"), 11: None}
+    assert index.counts(ids, by="accident", predictions=predictions) == {"Yes": {"Neutral": 1, "missing": 1},
+                                                                         "No": {"missing": 1}}
+
+
+def test_save_and_load_round_trip(index, tmp_path):
+    path = str(tmp_path / "index.json.gz")
+    index.save(path)
+    loaded = HeadlineIndex.load(path)
+    assert loaded.search('"hit and run" AND publisher-category:mainstream') == [10]
+    assert loaded.add(ROWS) == 0
@@ -0,0 +1,99 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from bike_frame import PROMPT_PROFILES
+from conftest import WhitespaceEncoding
+from scheduler import AIMDLimiter, ScheduledRunner, TokenBucket, retry_after
+from token_budget import TokenCounter
+
+ROW = {"original_index": 1, "Title": "Cyclist wins gold medal", "Publisher Title": "Alpha"}
+
+
+class FakeCompletions:
+    def __init__(self):
+        self.calls = 0
+
+    async def create(self, **kwargs):
+        self.calls += 1
+        message = SimpleNamespace(content="Final answer: ('No', 'Unknown', 'Positive')")
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=None)
+
+
+def fake_client():
+    return SimpleNamespace(chat=SimpleNamespace(completions=FakeCompletions()))
+
+
+@pytest.fixture
+def counter():
+    return TokenCounter(template=PROMPT_PROFILES["lean"], encoding=WhitespaceEncoding())
+
+
+def test_token_bucket_waits_for_refill():
+    bucket = TokenBucket(tokens_per_minute=600)
+    assert bucket.wait_time(600) == 0
+    bucket.take(600)
+    assert bucket.wait_time(60) == pytest.approx(6, rel=0.01)
+    assert bucket.wait_time(10_000) == pytest.approx(60, rel=0.01)  # capped at capacity
+
+
+def test_token_bucket_pause_blocks_refill():
+    bucket = TokenBucket(tokens_per_minute=600)
+    bucket.pause(2)
+    assert bucket.wait_time(1) >= 2
+
+
+def test_aimd_limiter_halves_on_rate_limit_and_grows_on_success():
+    limiter = AIMDLimiter(initial=8, maximum=16, cooldown=0)
+    limiter.on_rate_limit()
+    assert limiter.limit == 4
+    limiter.on_success()
+    assert limiter.limit > 4
+
+
+def test_retry_after_reads_seconds_and_milliseconds():
+    def error(headers):
+        return SimpleNamespace(response=SimpleNamespace(headers=headers))
+
+    assert retry_after(error({"retry-after": "3"})) == 3
+    assert retry_after(error({"retry-after-ms": "1500"})) == 1.5
+    assert retry_after(error({})) is None
+
+
+def test_request_cost_uses_the_runner_template(counter):
+    runner = ScheduledRunner(client=fake_client(), prompt=PROMPT_PROFILES["lean"].render, max_tokens=50,
+                             token_counter=counter)
+    assert runner.request_cost(ROW) == counter.row_tokens(ROW) + 50
+    assert runner.request_costs([ROW, ROW]) == [counter.row_tokens(ROW) + 50] * 2
+
+
+def test_request_cost_builds_a_counter_when_none_is_given(monkeypatch):
+    monkeypatch.setattr("token_budget.get_encoding", lambda model=None: WhitespaceEncoding())
+    runner = ScheduledRunner(client=fake_client(), prompt=PROMPT_PROFILES["lean"].render, max_tokens=50)
+    assert runner.request_cost(ROW) > 50
+    assert runner.token_counter.template is PROMPT_PROFILES["lean"]
+
+
+def test_request_cost_is_capped_at_bucket_capacity(counter):
+    runner = ScheduledRunner(client=fake_client(), tokens_per_minute=100, token_counter=counter, max_tokens=50)
+    assert runner.request_cost(ROW) == 100
+
+
+def test_fast_path_rows_spend_no_quota(counter):
+    client = fake_client()
+    runner = ScheduledRunner(client=client, tokens_per_minute=1000, token_counter=counter,
+                             pre_classifier=lambda row: ("No", "Unknown", "Positive"))
+    results = asyncio.run(runner.run([dict(ROW, original_index=i) for i in range(5)]))
+    assert all(result["fast_path"] for result in results)
+    assert client.chat.completions.calls == 0
+    assert runner.tokens_admitted == 0
+
+
+def test_run_admits_every_row(counter):
+    client = fake_client()
+    runner = ScheduledRunner(client=client, tokens_per_minute=10**7, token_counter=counter)
+    results = asyncio.run(runner.run([dict(ROW, original_index=i) for i in range(5)]))
+    assert [result["labels"] for result in results] == [("No", "Unknown", "Positive")] * 5
+    assert client.chat.completions.calls == 5
+    assert runner.tokens_admitted == sum(runner.request_costs([ROW] * 5))
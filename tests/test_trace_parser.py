@@ -0,0 +1,56 @@
+import pytest
+
+from trace_parser import TraceParser, final_labels, parse_final_answer, parse_trace
+
+TRACE = """\
+Starting analysis of the headline: Cyclist wins stage
+Is the headline discussing an accident? (False, 'No collision is reported.')
+Intermediate Rationale: A sporting win. The coverage is positive.
+Final answer: ('No', 'Unknown', 'Positive')
+Anything printed after the answer is ignored.
+"""
+
+
+@pytest.mark.parametrize("text", [
+    "Final answer: ('Yes', 'Other', 'Negative')",
+    "('yes', 'other', 'negative')",
+    "Yes, Other, Negative",
+    'Final answer:("YES","OTHER","NEGATIVE")',
+])
+def test_parse_final_answer_accepts_loose_formatting(text):
+    assert parse_final_answer(text) == ("Yes", "Other", "Negative")
+
+
+@pytest.mark.parametrize("text", ["('Yes', 'Other')", "('Maybe', 'Other', 'Negative')", ""])
+def test_parse_final_answer_rejects_invalid_tuples(text):
+    assert parse_final_answer(text) is None
+
+
+def test_final_labels_uses_the_last_answer():
+    text = "Final answer: ('Yes', 'Cyclist', 'Negative')\nRevised.\nFinal answer: ('No', 'Unknown', 'Neutral')"
+    assert final_labels(text) == ("No", "Unknown", "Neutral")
+    assert final_labels("no answer here") is None
+
+
+def test_streaming_parser_stops_at_the_closing_parenthesis():
+    parser = TraceParser()
+    answer_end = TRACE.index(")", TRACE.index("Final answer:")) + 1
+    for i in range(0, answer_end, 7):
+        parser.feed(TRACE[i:min(i + 7, answer_end)])
+    assert parser.done
+    assert parser.labels == ("No", "Unknown", "Positive")
+    assert parser.feed("more text") == []
+
+
+def test_streaming_parser_waits_for_a_complete_tuple():
+    parser = TraceParser()
+    parser.feed("Final answer: ('No', 'Unknown'")
+    assert not parser.done
+    parser.feed(", 'Positive')")
+    assert parser.labels == ("No", "Unknown", "Positive")
+
+
+def test_parse_trace_records_line_kinds():
+    parser = parse_trace(TRACE)
+    assert [record.kind for record in parser.records] == ["headline", "accident", "rationale", "final_answer"]
+    assert parser.labels == ("No", "Unknown", "Positive")
@@ -0,0 +1,198 @@
+import os
+import json
+import hashlib
+from functools import lru_cache
+from itertools import islice
+
+from bike_frame import DEFAULT_TEMPLATE
+from dataset import load_dataset
+
+DEFAULT_MODEL = "gpt-4o-mini"
+
+# USD per 1M tokens: (input, output).
+MODEL_PRICES = {
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4-turbo": (10.00, 30.00),
+    "gpt-4": (30.00, 60.00),
+    "gpt-3.5-turbo": (0.50, 1.50),
+}
+
+# Chat formatting overhead, following OpenAI's counting recipe for chat models.
+TOKENS_PER_MESSAGE = 3
+REPLY_PRIMING_TOKENS = 3
+# User turns encoded per batch-encoder call in TokenCounter.count_rows.
+CHUNK_SIZE = 4096
+
+
+@lru_cache(maxsize=None)
+def get_encoding(model=DEFAULT_MODEL):
+    import tiktoken
+
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
+
+
+class TokenCounter:
+    '''
+    Counts prompt tokens for a PromptTemplate. The shared few-shot prefix is counted once and
+    cached; each row then only costs the tokens of its own user turn.
+    '''
+    def __init__(self, model=DEFAULT_MODEL, template=DEFAULT_TEMPLATE, encoding=None):
+        self.model = model
+        self.template = template
+        self.encoding = encoding if encoding is not None else get_encoding(model)
+        self._prefix_tokens = None
+
+    def count_text(self, text):
+        return len(self.encoding.encode_ordinary(text))
+
+    def count_message(self, message):
+        return TOKENS_PER_MESSAGE + self.count_text(message["role"]) + self.count_text(message["content"])
+
+    @property
+    def prefix_tokens(self):
+        if self._prefix_tokens is None:
+            self._prefix_tokens = sum(self.count_message(m) for m in self.template.prefix) + REPLY_PRIMING_TOKENS
+        return self._prefix_tokens
+
+    def row_tokens(self, row):
+        '''
+        Input tokens of the full request for one dataset row.
+        '''
+        return self.prefix_tokens + self.count_message(self.template.user_message(row))
+
+    def count_rows(self, rows, chunk_size=CHUNK_SIZE, num_threads=None):
+        '''
+        Input tokens of every row, as row_tokens would count them, in one int32 array. Only the user
+        turns are encoded, `chunk_size` at a time through the encoding's batch encoder, whose native
+        core releases the GIL, so a chunk is spread over `num_threads` threads (default: all CPUs).
+        '''
+        import numpy as np
+
+        user_turn = TOKENS_PER_MESSAGE + self.count_text("user")
+        batch = getattr(self.encoding, "encode_ordinary_batch", None)
+        num_threads = num_threads or os.cpu_count() or 1
+        counts = []
+        chunk = []
+        for row in rows:
+            chunk.append(self.template.user_message(row)["content"])
+            if len(chunk) == chunk_size:
+                counts.append(self._count_chunk(chunk, batch, num_threads))
+                chunk = []
+        if chunk:
+            counts.append(self._count_chunk(chunk, batch, num_threads))
+        if not counts:
+            return np.zeros(0, dtype=np.int32)
+        return np.concatenate(counts) + np.int32(self.prefix_tokens + user_turn)
+
+    def _count_chunk(self, texts, batch, num_threads):
+        import numpy as np
+
+        if batch is not None:
+            tokens = batch(texts, num_threads=num_threads)
+        else:
+            tokens = map(self.encoding.encode_ordinary, texts)
+        return np.fromiter(map(len, tokens), dtype=np.int32, count=len(texts))
+
+    def fingerprint(self):
+        '''
+        Hash of everything a row's token count depends on besides the row: the encoding and the
+        template's prefix and user turn.
+        '''
+        name = getattr(self.encoding, "name", type(self.encoding).__name__)
+        payload = json.dumps([name, self.template.prefix, self.template.user_template], ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def messages_tokens(self, messages):
+        return sum(self.count_message(m) for m in messages) + REPLY_PRIMING_TOKENS
+
+    def example_output_tokens(self):
+        '''
+        Mean length of the few-shot answers, used as the expected completion size.
+        '''
+        answers = [m for m in self.template.prefix if m["role"] == "assistant"]
+        if not answers:
+            return 0
+        return sum(self.count_text(m["content"]) for m in answers) / len(answers)
+
+
+def estimate_cost(input_tokens, output_tokens, model):
+    input_price, output_price = MODEL_PRICES[model]
+    return (input_tokens * input_price + output_tokens * output_price) / 1_000_000
+
+
+def token_counts_path(data_path, counter):
+    '''
+    Where the token counts of `data_path` under `counter` are cached: next to the dataset, named by
+    the counter's fingerprint, so editing the template or switching tokenizer starts a new file.
+    '''
+    return f"{data_path}.tokens-{counter.fingerprint()[:16]}.npy"
+
+
+def dataset_token_counts(data_path, counter, limit=None, cache=True):
+    '''
+    Input tokens of the first `limit` rows of a dataset (all rows by default) as an int32 array.
+    The full-dataset counts are cached next to the dataset and reused until the dataset file is
+    modified or the template changes; a `limit` run reads the cache but does not write it.
+    '''
+    import numpy as np
+
+    path = token_counts_path(data_path, counter)
+    if cache and os.path.exists(path) and os.path.getmtime(path) >= os.path.getmtime(data_path):
+        return np.load(path)[:limit]
+    counts = counter.count_rows(islice(load_dataset(data_path), limit))
+    if cache and limit is None:
+        np.save(path, counts)
+    return counts
+
+
+def dry_run_report(rows, counter=None, output_tokens_per_row=None, max_input_tokens=None, models=None,
+                   counts=None):
+    '''
+    Count the input tokens of every row without sending anything and price the run.
+    Token counts use the counter's tokenizer for every model, so costs for models with a
+    different tokenizer are estimates. `counts`, if given, are precomputed per-row counts in row
+    order (e.g. from dataset_token_counts); otherwise the rows are counted in bulk.
+    Returns:
+        dict: totals, per-row counts keyed by original_index, the rows over `max_input_tokens`
+        and the estimated cost in USD for each model in MODEL_PRICES.
+    '''
+    counter = counter if counter is not None else TokenCounter()
+    if output_tokens_per_row is None:
+        output_tokens_per_row = round(counter.example_output_tokens())
+
+    rows = list(rows)
+    if counts is None:
+        counts = counter.count_rows(rows)
+    counts = counts.tolist()
+    per_row = {row.get("original_index", position): n for position, (row, n) in enumerate(zip(rows, counts))}
+
+    n_rows = len(counts)
+    input_total = sum(counts)
+    output_total = output_tokens_per_row * n_rows
+    over_budget = []
+    if max_input_tokens is not None:
+        over_budget = [index for index, n in per_row.items() if n > max_input_tokens]
+
+    return {
+        "model": counter.model,
+        "rows": n_rows,
+        "prefix_tokens": counter.prefix_tokens,
+        "input_tokens_total": input_total,
+        "input_tokens_per_row": {
+            "min": min(counts, default=0),
+            "mean": input_total / n_rows if n_rows else 0,
+            "max": max(counts, default=0),
+        },
+        "output_tokens_per_row": output_tokens_per_row,
+        "output_tokens_total": output_total,
+        "over_budget": over_budget,
+        "per_row": per_row,
+        "cost_usd": {
+            model: round(estimate_cost(input_total, output_total, model), 4)
+            for model in (models or MODEL_PRICES)
+        },
+    }
@@ -0,0 +1,184 @@
+import ast
+from collections import namedtuple
+
+LABELS = {
+    "accident": ("Yes", "No"),
+    "fault": ("Cyclist", "Other", "Unknown"),
+    "perception": ("Negative", "Positive", "Neutral"),
+}
+TASKS = tuple(LABELS)
+FINAL_ANSWER = "Final answer:"
+
+# Line prefixes printed by the BikeFrame pseudocode, mapped to record kinds.
+LINE_KINDS = (
+    ("Starting analysis of the headline:", "headline"),
+    ("Extracted News Source:", "source"),
+    ("Is the headline discussing an accident?", "accident"),
+    ("Party behaviors:", "party_behaviors"),
+    ("Law analysis:", "law"),
+    ("Tone analysis:", "tone"),
+    ("Most likely accident-related fault party:", "fault_party"),
+    ("Therefore, the fault is attributed to", "fault"),
+    ("No accident, hence,", "no_accident"),
+    ("News Coverage Analysis Result:", "news_coverage"),
+    ("Intermediate Rationale:", "rationale"),
+    (FINAL_ANSWER, "final_answer"),
+)
+
+# kind: record kind from LINE_KINDS, or "other"; text: the line after its prefix; value: parsed content.
+TraceRecord = namedtuple("TraceRecord", "kind text value")
+
+_CANONICAL = {task: {label.lower(): label for label in labels} for task, labels in LABELS.items()}
+
+
+def parse_final_answer(text):
+    '''
+    Parse "('Yes', 'Other', 'Positive')", with or without quotes, parentheses or spacing.
+    Returns:
+        tuple: (accident, fault, perception) in canonical case, or None if it is not a valid answer.
+    '''
+    text = text.strip()
+    if text.startswith(FINAL_ANSWER):
+        text = text[len(FINAL_ANSWER):].strip()
+    start = text.find("(")
+    if start != -1:
+        end = text.find(")", start)
+        text = text[start + 1:end if end != -1 else len(text)]
+    return canonical_labels(part.strip().strip("'\"` ") for part in text.split(","))
+
+
+def canonical_labels(values):
+    '''
+    (accident, fault, perception) in canonical case from three label strings in any case, or None
+    if there are not exactly three valid labels.
+    '''
+    parts = [str(value).strip().lower() for value in values]
+    if len(parts) != 3:
+        return None
+    labels = tuple(_CANONICAL[task].get(part) for task, part in zip(TASKS, parts))
+    return None if None in labels else labels
+
+
+def final_labels(text):
+    '''
+    Labels from the last "Final answer:" line of a complete response, or None.
+    '''
+    if not text:
+        return None
+    position = text.rfind(FINAL_ANSWER)
+    if position == -1:
+        return None
+    return parse_final_answer(text[position:].split("\n", 1)[0])
+
+
+def _split_party(text, marker):
+    party, _, rest = text.partition(marker)
+    return party.strip(), rest
+
+
+def parse_line(line):
+    line = line.strip()
+    for prefix, kind in LINE_KINDS:
+        if line.startswith(prefix):
+            text = line[len(prefix):].strip()
+            break
+    else:
+        return TraceRecord("other", line, None)
+
+    value = text
+    if kind == "accident":
+        label, _, rationale = text.partition(",")
+        rationale = rationale.strip()
+        if rationale.startswith("based on rationale:"):
+            rationale = rationale[len("based on rationale:"):].strip()
+        value = (_CANONICAL["accident"].get(label.strip().lower()), rationale)
+    elif kind == "party_behaviors":
+        try:
+            value = ast.literal_eval(text)
+        except (ValueError, SyntaxError):
+            value = text
+    elif kind == "law":
+        statement, _, rationale = text.partition("Rationale:")
+        if " did not violate the law" in statement:
+            party, _ = _split_party(statement, " did not violate the law")
+            violated = False
+        else:
+            party, _ = _split_party(statement, " violated the law")
+            violated = True
+        value = (party, violated, rationale.strip())
+    elif kind == "tone":
+        party, rest = _split_party(text, " is described as ")
+        description, _, suggestion = rest.partition(", suggesting ")
+        value = (party, description.strip("'\" "), suggestion.strip().rstrip("."))
+    elif kind == "fault":
+        value = _CANONICAL["fault"].get(text.strip(" .'\"").lower())
+    elif kind == "no_accident":
+        value = "Unknown"
+    elif kind == "final_answer":
+        value = parse_final_answer(text)
+    return TraceRecord(kind, text, value)
+
+
+class TraceParser:
+    '''
+    Incremental parser for a streamed BikeFrame execution trace. Feed it chunks as they arrive;
+    each completed line becomes a TraceRecord. Parsing stops at the final tuple, which is
+    recognised as soon as its closing parenthesis arrives, without waiting for a newline.
+    '''
+    def __init__(self):
+        self.records = []
+        self.labels = None
+        self.done = False
+        self._buffer = ""
+
+    def _add(self, line):
+        if not line.strip():
+            return None
+        record = parse_line(line)
+        self.records.append(record)
+        if record.kind == "final_answer":
+            self.labels = record.value
+            self.done = True
+        return record
+
+    def feed(self, chunk):
+        '''
+        Consume a chunk of text and return the records it completed.
+        '''
+        if self.done:
+            return []
+        new = []
+        self._buffer += chunk
+        while not self.done:
+            newline = self._buffer.find("\n")
+            if newline == -1:
+                break
+            line, self._buffer = self._buffer[:newline], self._buffer[newline + 1:]
+            record = self._add(line)
+            if record is not None:
+                new.append(record)
+        pending = self._buffer.lstrip()
+        if not self.done and pending.startswith(FINAL_ANSWER) and ")" in pending:
+            self._buffer = ""
+            new.append(self._add(pending))
+        return new
+
+    def close(self):
+        '''
+        Flush the last unterminated line at the end of the stream.
+        '''
+        new = []
+        if not self.done and self._buffer.strip():
+            new.append(self._add(self._buffer))
+        self._buffer = ""
+        return new
+
+    def by_kind(self, kind):
+        return [record for record in self.records if record.kind == kind]
+
+
+def parse_trace(text):
+    parser = TraceParser()
+    parser.feed(text)
+    parser.close()
+    return parser